@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+""" Benchmark of DataFrame -> SQL INSERT construction (base_rates_db_interface) """
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+import sql_class_base as sbc
+import base_interest_rates_interface as rates_dbi
+
+TREASURY_ITEMS = ["DGS1MO", "DGS3MO", "DGS6MO", "DGS1", "DGS2", "DGS3", "DGS5", "DGS7",
+                  "DGS10", "DGS20", "DGS30"]
+
+
+def build_rate_frame(rows, nan_perc=0.05, seed=1):
+    ''' constructs synthetic treasury style rate frame (DatetimeIndex x TREASURY_ITEMS) '''
+    rng = np.random.default_rng(seed)
+    vals = rng.uniform(0.01, 6.0, size=(rows, len(TREASURY_ITEMS))).round(2)
+    vals[rng.uniform(size=vals.shape) < nan_perc] = np.nan
+    vals[rng.uniform(size=rows) < 0.02, :] = np.nan        # holidays
+    vals[rng.uniform(size=rows) < 0.01, :] = 0.0           # zeroed loads
+
+    index = pd.date_range("1900-01-01", periods=rows, freq="h")
+    return pd.DataFrame(vals, index=index, columns=TREASURY_ITEMS)
+
+
+def build_options(items=None):
+    ''' minimal dryrun options for base_rates_db_interface '''
+    items = TREASURY_ITEMS if items is None else items
+    return {"table": "daily_rate_treasury_data", "index_name": "index_date",
+            "items": {itm: '' for itm in items}, "verbose": 0}
+
+
+def legacy_dataframe_insert(db_interface, df):
+    ''' reference (iterrows) implementation of db_dataframe_insert '''
+    insert_query = sbc.sql_query_base(db_interface.options, q_str="INSERT")
+    insert_query.construct_insert_start(include_index=True)
+    insert_query.append_names(excludes=db_interface.options["index_name"], append="")
+    not_triggered = True
+
+    for row in df.iterrows():
+        if np.all(np.isnan(row[1])):
+            continue
+        if np.isnan(row[1]).sum() / float(df.shape[1]) > db_interface.options["exclude_perc"]:
+            continue
+
+        arr = row[1].to_numpy(copy=True)
+        if np.mean(arr, axis=0) < 0.0001 and np.var(arr, axis=0) < 0.0001:
+            continue
+
+        if isinstance(insert_query.columns, (dict, sbc.co.OrderedDict)):
+            base = insert_query.append_values_dict(row)
+        else:
+            base = insert_query.append_values_naive(row)
+
+        insert_query.append_query_element(base, append=("\n" if not_triggered else ", \n"))
+        not_triggered = False
+
+    insert_query.clean_query_element()
+    return insert_query.get_query()
+
+
+def time_call(func, *args):
+    ''' returns (elapsed seconds, result) '''
+    start = time.perf_counter()
+    res = func(*args)
+    return time.perf_counter() - start, res
+
+
+def benchmark_dataframe_insert(db_interface, df, legacy=True):
+    ''' times vectorized db_dataframe_insert (and legacy iterrows version) '''
+    db_interface.insert_query = sbc.sql_query_base(db_interface.options, q_str="INSERT")
+    elapsed, _ = time_call(db_interface.db_dataframe_insert, df)
+    res = {"vectorized": elapsed}
+
+    if legacy:
+        res["iterrows"], q_legacy = time_call(legacy_dataframe_insert, db_interface, df)
+        res["identical"] = q_legacy == db_interface.insert_query.get_query()
+
+    return res
+
+
+def benchmark_insert_modes(db_interface, df, modes=("literal", "executemany", "load_data")):
+    ''' times construct_db_insert (build + write) per insert_mode against live (scratch) table
+        of backend (mysql or sqlite) -- table is emptied before each run
+    '''
+    res = {}
+    table = db_interface.options["table"]
+    cols = ", ".join([itm + " DOUBLE" for itm in df.columns])
+    db_interface.mysql_conn.update(" ".join([
+        "CREATE TABLE IF NOT EXISTS", table, "(", db_interface.options["index_name"], "DATE,",
+        cols, ");"]))
+
+    if db_interface.calc_dialect() != "mysql":
+        modes = [mode for mode in modes if mode != "load_data"]
+
+    for mode in modes:
+        db_interface.mysql_conn.update("DELETE FROM " + table + ";")
+        db_interface.options["insert_mode"] = mode
+        db_interface.insert_query = sbc.sql_query_base(db_interface.options, q_str="INSERT")
+
+        res[mode], _ = time_call(db_interface.construct_db_insert, df)
+        res[mode + "_rows"] = db_interface.mysql_conn.query(
+            "SELECT COUNT(*) AS cnt FROM " + table + ";")[0]['cnt']
+
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark rates DB insert construction")
+    parser.add_argument("-n", "--rows", default="10000,100000,1000000", type=str)
+    parser.add_argument("-l", "--legacy_max", default=100000, type=int,
+                        help="Max rows for which legacy (iterrows) path is timed")
+    parser.add_argument("-o", "--options", default=None, type=str,
+                        help="Options JSON (path/group or user/password/db_host_ip of local "
+                        "MySQL/MariaDB stand-in or backend sqlite + db_file) -- times "
+                        "insert_mode(s) against scratch table")
+    parser.add_argument("-t", "--table", default="bench_rate_treasury_data", type=str)
+
+    args = parser.parse_args()
+
+    db_intf = rates_dbi.base_rates_db_interface(build_options(), True)
+
+    for cnt in [int(val) for val in args.rows.split(",")]:
+        frame = build_rate_frame(cnt)
+        result = benchmark_dataframe_insert(db_intf, frame, legacy=(cnt <= args.legacy_max))
+
+        line = "rows %8d vectorized %8.3fs" % (cnt, result["vectorized"])
+        if "iterrows" in result:
+            line = line + " iterrows %8.3fs speedup %6.1fx identical %s" % (
+                result["iterrows"], result["iterrows"] / result["vectorized"],
+                result["identical"])
+        print(line)
+
+    if args.options:
+        with open(args.options, "r") as fp:
+            db_options = json.load(fp)
+        fp.close()
+
+        db_options.update(build_options())
+        db_options["table"] = args.table
+        db_options["insert_mode"] = "load_data"     # enables allow_local_infile (mysql)
+        db_intf = rates_dbi.base_rates_db_interface(db_options, False)
+
+        for cnt in [int(val) for val in args.rows.split(",")]:
+            result = benchmark_insert_modes(db_intf, build_rate_frame(cnt))
+            print("rows %8d " % (cnt) + " ".join(
+                ["%s %8.3fs (%d)" % (key, val, result[key + "_rows"])
+                 for key, val in result.items() if not key.endswith("_rows")]))
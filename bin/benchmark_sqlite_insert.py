@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+""" Benchmark of DataFrame -> sqlite insert (sqlalchemy_db_class records vs bulk mode) """
+import argparse
+import os
+import tempfile
+import sqlalchemy as sa
+import sql_alchemy_class as sac
+from benchmark_rates_insert import build_rate_frame, time_call, TREASURY_ITEMS
+
+
+def create_rate_table(db_class, table):
+    ''' (re)creates scratch rate table & drops cached reflection '''
+    cols = ", ".join([itm + " REAL" for itm in TREASURY_ITEMS])
+    with db_class.engine.begin() as conn:
+        conn.execute(sa.text("DROP TABLE IF EXISTS " + table))
+        conn.execute(sa.text(" ".join([
+            "CREATE TABLE", table, "(index_date TEXT,", cols, ")"])))
+    db_class.refresh_schema(table)
+
+
+def count_rows(db_class, table):
+    ''' number of rows in table '''
+    with db_class.engine.connect() as conn:
+        return conn.execute(sa.text("SELECT COUNT(*) FROM " + table)).scalar()
+
+
+def benchmark_sqlite_insert(db_class, df, table, records=True, chunk_size=100000):
+    ''' times bulk (tuples / pragmas / chunks) and records (to_dict) insert paths '''
+    res = {}
+    create_rate_table(db_class, table)
+    res["bulk"], _ = time_call(db_class.insert, df.rename_axis("index_date"),
+                               {"table": table, "bulk": True, "chunk_size": chunk_size})
+    res["bulk_rows"] = count_rows(db_class, table)
+
+    if records:
+        create_rate_table(db_class, table)
+        frame = df.rename_axis("index_date").reset_index()
+        frame["index_date"] = frame["index_date"].dt.strftime("%Y-%m-%d")
+        res["records"], _ = time_call(db_class.insert, frame, {"table": table})
+        res["records_rows"] = count_rows(db_class, table)
+
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sqlite DataFrame insert")
+    parser.add_argument("-c", "--chunk_size", default=100000, type=int)
+    parser.add_argument("-f", "--db_file", default=None, type=str,
+                        help="sqlite file (default: temporary file)")
+    parser.add_argument("-n", "--rows", default="100000,1000000", type=str)
+    parser.add_argument("-r", "--records_max", default=1000000, type=int,
+                        help="Max rows for which records (to_dict) path is timed")
+    parser.add_argument("-t", "--table", default="bench_rate_treasury_data", type=str)
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = (args.db_file if args.db_file else
+                   os.path.join(directory, "bench_rates.db"))
+        db_intf = sac.sqlalchemy_db_class(path=db_file)
+
+        for cnt in [int(val) for val in args.rows.split(",")]:
+            result = benchmark_sqlite_insert(db_intf, build_rate_frame(cnt), args.table,
+                                             records=(cnt <= args.records_max),
+                                             chunk_size=args.chunk_size)
+            line = "rows %8d bulk %8.3fs (%d)" % (cnt, result["bulk"], result["bulk_rows"])
+            if "records" in result:
+                line = line + " records %8.3fs (%d) speedup %6.1fx" % (
+                    result["records"], result["records_rows"],
+                    result["records"] / result["bulk"])
+            print(line)
+
+        db_intf.engine.dispose()
@@ -2,21 +2,46 @@
 """ Basic Interface to FRED"""
 import collections as co
 import argparse
+import concurrent.futures as cf
 import json
 import os
+import shutil
 import sys
+import tempfile
+import threading
+import time
 import zipfile
 import pandas as pd
 from fredapi import Fred
 import debug_control as dbc
+import fred_cache as fc
 import backup_utility as bu
 import base_interest_rates_interface as rates_dbi
 
+SPOOL_MAX_SIZE = 64 * 1024 * 1024  # zip members larger than this spill to temporary file
+
+
+class rate_limiter():
+    ''' thread safe client side limiter -- at most rate requests per period (seconds) '''
+    def __init__(self, rate=120, period=60.0):
+        self.interval = (float(period) / rate if rate and rate > 0 else 0.0)
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        ''' blocks until next request slot is available '''
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if wait > 0:
+            time.sleep(wait)
 
 
 class fred_interface():
     ''' class extension of the fredapi '''
-    def __init__(self, options, dbg=False):
+    def __init__(self, options, dbg=False, fred=None):
         """ Main function that extracts key data points from FRED (St. Louis Federal Reserve)
 
             =====================================================
@@ -26,13 +51,25 @@ class fred_interface():
                     & values used to replace names  if different from ''
             -- start_date:  first value to request
             -- end_date:    max value to request
+            -- concurrency: number of series requested in parallel (default 1)
+            -- rate_limit:  max FRED requests per minute (default 120)
+            -- retries:     per series retries w/ exponential backoff (default 3)
+            -- backoff:     initial backoff in seconds (default 1.0)
+            -- watermarks:  optional {item: "%Y-%m-%d"} -- series requested from watermark + 1
+                    day (if later than start_date)
+            -- cache:       optional on-disk cache specification (see fred_cache)
+            fred: optional (fredapi.Fred compatible) client, constructed from api_key if None
         """
         self.df = None
+        self.fred = fred
         if options and isinstance(options, dict):
             self.options = options.copy()
         else:
             raise ValueError("Must specify valid options specification")
 
+        self.cache = (fc.fred_cache(self.options["cache"])
+                      if "cache" in self.options.keys() and self.options["cache"] else None)
+
         self.dbg = dbg
 
         if "api_key" not in self.options.keys() and "file" in self.options.keys():
@@ -50,46 +87,135 @@ class fred_interface():
             self.__repr__()
 
     def extract(self):
-        ''' extracts data directly apply FRED API '''
+        ''' extracts data directly apply FRED API -- series are requested concurrently
+            (bounded by concurrency & rate_limit), frame columns follow options["items"] order
+        '''
+        if self.fred is None:
+            self.fred = Fred(api_key=self.options["api_key"])
+
+        concurrency = (int(self.options["concurrency"]) if "concurrency" in self.options.keys()
+                       else 1)
+        limiter = rate_limiter((int(self.options["rate_limit"])
+                                if "rate_limit" in self.options.keys() else 120))
+
         df = {}
-        fred = Fred(api_key=self.options["api_key"])
-        for item in self.options["items"].keys():
-            try:
-                if self.options["end_date"]:
-                    df[item] = fred.get_series(item, observation_start=self.options["start_date"],
-                                               observation_end=self.options["end_date"])
-                else:
-                    df[item] = fred.get_series(item, observation_start=self.options["start_date"])
-            except ValueError as v:
-                print("%s : %s " % (item, v))
-                continue
+        with cf.ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+            futures = {pool.submit(self.extract_series, item, limiter): item
+                       for item in self.options["items"].keys()}
+            for future in cf.as_completed(futures):
+                series = future.result()
+                if series is not None:
+                    df[futures[future]] = series
+
+        self.df = pd.DataFrame({item: df[item] for item in self.options["items"].keys()
+                                if item in df})
+
+        if self.cache is not None:
+            self.cache.save_index()
+            if self.dbg:
+                print(self.cache)
+
+    def extract_series(self, item, limiter=None):
+        ''' requests single series (or reads from cache), returns None on failure '''
+        end_date = self.options["end_date"] if "end_date" in self.options.keys() else None
+        start_date = self.calc_series_start(item)
+
+        last_updated = None
+        if self.cache is not None and self.cache.vintage:
+            info = self.request(item, limiter, self.fred.get_series_info, item)
+            last_updated = str(info['last_updated']) if info is not None else None
+
+        if self.cache is not None:
+            data = self.cache.get(item, start_date, end_date, last_updated=last_updated)
+            if data is not None:
+                return data
+
+        if end_date:
+            data = self.request(item, limiter, self.fred.get_series, item,
+                                observation_start=start_date, observation_end=end_date)
+        else:
+            data = self.request(item, limiter, self.fred.get_series, item,
+                                observation_start=start_date)
 
-        self.df = pd.DataFrame(df)
+        if data is not None and self.cache is not None:
+            self.cache.put(item, data, start_date, end_date, last_updated=last_updated)
 
-    def load(self):
-        ''' loads FRED data from excel or zip of excel file '''
-        if self.options['file']['filename'].lower().endswith("zip"):
-            zfile = zipfile.ZipFile(self.options['file']['filename'])
+        return data
 
-            base_dir = self.options['file']['filename'].split(os.sep)
-            ffile = base_dir.pop(len(base_dir)-1)
-            base_dir = os.sep.join(base_dir)
+    def request(self, item, limiter, func, *args, **kwargs):
+        ''' calls FRED func w/ retry + exponential backoff, returns None on failure '''
+        retries = int(self.options["retries"]) if "retries" in self.options.keys() else 3
+        backoff = float(self.options["backoff"]) if "backoff" in self.options.keys() else 1.0
 
-            afile = self.options['file']['filename'].replace(".zip", "").replace("_x", ".x")
-            ffile = ffile.replace(".zip", "").replace("_x", ".x")
-            zfile.extract(ffile, path=base_dir)
+        for attempt in range(retries + 1):
+            try:
+                if limiter:
+                    limiter.acquire()
+                return func(*args, **kwargs)
+
+            except (ValueError, OSError) as v:
+                # Bad Request => series / parameters faulty, retry will not help
+                if attempt >= retries or str(v).startswith("Bad Request"):
+                    print("%s : %s " % (item, v))
+                    return None
+
+                if self.dbg:
+                    print("%s : %s (retry %d)" % (item, v, attempt + 1))
+                time.sleep(backoff * 2 ** attempt)
+
+        return None
+
+    def calc_series_start(self, item):
+        ''' calculates first observation to request for item -- later of start_date &
+            watermark + 1 day
+        '''
+        start_date = self.options["start_date"]
+        if "watermarks" in self.options.keys() and self.options["watermarks"] and\
+                item in self.options["watermarks"]:
+            watermark = pd.Timestamp(self.options["watermarks"][item]) + pd.Timedelta(days=1)
+            if start_date is None or watermark > pd.Timestamp(start_date):
+                start_date = watermark.strftime("%Y-%m-%d")
+
+        return start_date
 
-            if os.path.exists(afile):
-                df = pd.read_excel(afile, sheet_name=self.options['file']['sheet'],
-                                   index_col=self.options['file']['col'])
+    def load(self):
+        ''' loads FRED data from excel or zip of excel file -- zip members are streamed into a
+            spooled (in memory) buffer, nothing is extracted to disk
+        '''
+        spec = self.options['file']
+        if spec['filename'].lower().endswith("zip"):
+            member = (spec['member'] if 'member' in spec.keys() else
+                      os.path.basename(spec['filename']).replace(".zip", "").replace("_x", ".x"))
+
+            with zipfile.ZipFile(spec['filename']) as zfile:
+                if member not in zfile.namelist():
+                    raise ValueError("No File Found %s (%s)" % (member, spec['filename']))
+
+                with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buf:
+                    with zfile.open(member) as zmember:
+                        shutil.copyfileobj(zmember, buf)
+                    buf.seek(0)
+                    df = self.read_excel(buf)
+
+        elif os.path.exists(spec['filename']):
+            df = self.read_excel(spec['filename'])
+        else:
+            raise ValueError("No File Found %s" % (spec['filename']))
 
-                if 'start_date' in self.options.keys():
-                    self.df = df[df.index >= self.options['start_date']].copy()
-                else:
-                    self.df = df.copy()
-                os.remove(afile)
-            else:
-                raise ValueError("No File Found %s" % (afile))
+        if 'start_date' in self.options.keys() and self.options['start_date']:
+            self.df = df[df.index >= self.options['start_date']]
+        else:
+            self.df = df
+
+    def read_excel(self, source):
+        ''' reads sheet(s) (joined on index when list of sheets) & only usecols if specified '''
+        spec = self.options['file']
+        df = pd.read_excel(source, sheet_name=spec['sheet'], index_col=spec['col'],
+                           usecols=(spec['usecols'] if 'usecols' in spec.keys() else None))
+
+        if isinstance(df, dict):
+            df = pd.concat(list(df.values()), axis=1)
+        return df
 
     def clean_names(self):
         ''' Updates df names '''
@@ -118,6 +244,87 @@ class fred_interface():
         print(self.df.tail())
 
 
+def normalize_options(options, dryrun=False, verbose=0):
+    ''' Normalizes (JSON) options in place -- items => dict, end_date & debug settings,
+        returns dbg
+    '''
+    if "items" in options.keys() and isinstance(options["items"], list):
+        items = options["items"].copy() # tunr list into OrderedDict
+
+        if "items" in options.keys():
+            options.pop("items", "")
+
+        options["items"] = {}
+        for itm in items:
+            options["items"][itm] = ''
+
+    elif "items" in options.keys() and isinstance(options["items"], dict):
+        dict_items = options["items"].copy()
+
+        if "items" in options.keys():
+            options.pop("items", "")
+        options["items"] = {}
+
+        for key, val in dict_items.items():
+            options["items"][key] = val
+
+    else:
+        raise ValueError("Faulty Index list")
+
+    if "end_date" in options.keys() and options["end_date"] == "":
+        options["end_date"] = None
+
+    if "table" not in options.keys() and not dryrun:
+        raise ValueError("Results Table must be specified")
+
+    if verbose > 0:
+        options["verbose"] = verbose
+        dbg = True
+    else:
+        dbg = True
+        if "verbose" not in options.keys() and "debug_file" not in options.keys():
+            dbg = False
+            options["verbose"] = 0
+        elif "debug_file" in options.keys():
+            options["debug_file"] = bu.append_date_file(options["debug_file"])
+
+    return dbg
+
+
+def calc_job_dates(options, db_interface, dbg=False):
+    ''' Updates options start_date (& watermarks) based on current DB state '''
+    if db_interface:
+        options["start_date"] = db_interface.calc_start_date(options['start_date'])
+
+    if "append" in options and options["append"] > 0 and "current_view" in options:
+        if db_interface:
+            options["start_date"] = db_interface.calc_most_recent_date(options["start_date"])
+        dbc.print_helper(("Updated start date " + str(options["start_date"])), dbg=dbg)
+
+    if "incremental" in options and options["incremental"] > 0 and db_interface:
+        options["watermarks"] = db_interface.calc_series_watermarks()
+        dbc.print_helper(("Series watermarks " + str(options["watermarks"])), dbg=dbg)
+
+
+def write_frame(db_interface, df, update=False):
+    ''' Writes extracted frame -- wide (insert or insert + update) or vertical table
+        (single series or options vertical / columns: all series melted into vertical table)
+    '''
+    vertical = bool(("vertical" in db_interface.options.keys() and
+                     db_interface.options["vertical"]) or db_interface.calc_is_vertical())
+    if df.shape[1] > 0 and vertical:
+        db_interface.db_vertical_insert(df)
+    elif df.shape[1] > 1 and update:
+        db_interface.construct_db_insert_update(df)
+    elif df.shape[1] > 1:
+        db_interface.construct_db_insert(df)
+    elif df.shape[1] == 1:
+        db_interface.db_vertical_insert(df)
+    else:
+        dbc.print_helper("Warning: NO results written", dbg=db_interface.dbg)
+    db_interface.save_series_watermarks()
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Basic CLI interface to FRED")
     parser.add_argument("-a", "--api_key", default="", type=str)
@@ -156,57 +363,14 @@ if __name__ == "__main__":
             options = json.load(fp)
         fp.close()
 
-        if "items" in options.keys() and isinstance(options["items"], list):
-            items = options["items"].copy() # tunr list into OrderedDict
-
-            if "items" in options.keys():
-                options.pop("items", "")
-
-            options["items"] = {}
-            for itm in items:
-                options["items"][itm] = ''
-
-        elif "items" in options.keys() and isinstance(options["items"], dict):
-            dict_items = options["items"].copy()
-
-            if "items" in options.keys():
-                options.pop("items", "")
-            options["items"] = {}
-
-            for key, val in dict_items.items():
-                options["items"][key] = val
-
-        else:
-            raise ValueError("Faulty Index list")
-
-        if options["end_date"] == "":
-            options["end_date"] = None
-
-        if "table" not in options.keys() and not dryrun:
-            raise ValueError("Results Table must be specified")
-
-        if args.verbose > 0:
-            options["verbose"] = args.verbose
-            dbg = True
-        else:
-            dbg = True
-            if "verbose" not in options.keys() and "debug_file" not in options.keys():
-                dbg = False
-                options["verbose"] = 0
-            elif "debug_file" in options.keys():
-                options["debug_file"] = bu.append_date_file(options["debug_file"])
+        dbg = normalize_options(options, dryrun=dryrun, verbose=args.verbose)
 
         if not dryrun:
             db_interface = rates_dbi.base_rates_db_interface(options, dryrun)
-            options["start_date"] = db_interface.calc_start_date(options['start_date'])
         else:
             db_interface = None
 
-        if "append" in options and options["append"] > 0 and "current_view" in options:
-            if db_interface:
-                options["start_date"] = db_interface.calc_most_recent_date(options["start_date"])
-            dbc.print_helper(("Updated start date " + str(options["start_date"])), dbg=dbg)
-
+        calc_job_dates(options, db_interface, dbg=dbg)
 
     elif "db_host_ip" in args_dict.keys() and "items" in args_dict.keys() and\
             "table" in args_dict.keys():
@@ -251,12 +415,7 @@ if __name__ == "__main__":
                 db_interface = rates_dbi.base_rates_db_interface(options, dryrun)
 
             if not dryrun and db_interface.mysql_conn is not None:
-                if df.shape[1] > 1:
-                    db_interface.construct_db_insert(df)
-                elif df.shape[1] == 1:
-                    db_interface.db_vertical_insert(df)
-                else:
-                    dbc.print_helper("Warning: NO results written", dbg=db_interface.dbg)
+                write_frame(db_interface, df, update=False)
             else:
                 if dryrun:
                     dbc.print_helper("Warning dryrun is set", dbg=dbg)
@@ -276,6 +435,9 @@ if __name__ == "__main__":
         else:
             dbc.error_helper(("Failure" + str(sys.exc_info()[0])), None, dbg=dbg)
     finally:
+        if db_interface:
+            db_interface.print_cache_stats()
+
         if isinstance(dbg, dbc.debug_control):
             dbg.close()
 
@@ -47,56 +47,14 @@ if __name__ == "__main__":
             options = json.load(fp)
         fp.close()
 
-        if "items" in options.keys() and isinstance(options["items"], list):
-            items = options["items"].copy() # tunr list into OrderedDict
-
-            if "items" in options.keys():
-                options.pop("items", "")
-
-            options["items"] = {}
-            for itm in items:
-                options["items"][itm] = ''
-
-        elif "items" in options.keys() and isinstance(options["items"], dict):
-            dict_items = options["items"].copy()
-
-            if "items" in options.keys():
-                options.pop("items", "")
-            options["items"] = {}
-
-            for key, val in dict_items.items():
-                options["items"][key] = val
-
-        else:
-            raise ValueError("Faulty Index list")
-
-        if options["end_date"] == "":
-            options["end_date"] = None
-
-        if "table" not in options.keys() and not dryrun:
-            raise ValueError("Results Table must be specified")
-
-        if args.verbose > 0:
-            options["verbose"] = args.verbose
-            dbg = True
-        else:
-            dbg = True
-            if "verbose" not in options.keys() and "debug_file" not in options.keys():
-                dbg = False
-                options["verbose"] = 0
-            elif "debug_file" in options.keys():
-                options["debug_file"] = bu.append_date_file(options["debug_file"])
+        dbg = fredi.normalize_options(options, dryrun=dryrun, verbose=args.verbose)
 
         if not dryrun:
             db_interface = rates_dbi.rates_db_interface_extended(options, dryrun)
-            options["start_date"] = db_interface.calc_start_date(options['start_date'])
         else:
             db_interface = None
 
-        if "append" in options and options["append"] > 0 and "current_view" in options:
-            options["start_date"] = db_interface.calc_most_recent_date(options["start_date"])
-            dbc.print_helper(("Updated start date " + str(options["start_date"])), dbg=dbg)
-
+        fredi.calc_job_dates(options, db_interface, dbg=dbg)
 
     elif "db_host_ip" in args_dict.keys() and "items" in args_dict.keys() and\
             "table" in args_dict.keys():
@@ -144,12 +102,7 @@ if __name__ == "__main__":
                 db_interface = rates_dbi.rates_db_interface_extended(options, dryrun)
 
             if not dryrun and db_interface.mysql_conn is not None:
-                if df.shape[1] > 1:
-                    db_interface.construct_db_insert_update(df)
-                elif df.shape[1] == 1:
-                    db_interface.db_vertical_insert(df)
-                else:
-                    dbc.print_helper("Warning: NO results written", dbg=db_interface.dbg)
+                fredi.write_frame(db_interface, df, update=True)
             else:
                 if dryrun:
                     dbc.print_helper("Warning dryrun is set", dbg=dbg)
@@ -169,6 +122,9 @@ if __name__ == "__main__":
         else:
             dbc.error_helper(("Failure" + str(sys.exc_info()[0])), None, dbg=dbg)
     finally:
+        if db_interface:
+            db_interface.print_cache_stats()
+
         if isinstance(dbg, dbc.debug_control):
             dbg.close()
 
@@ -2,35 +2,100 @@
 #!/usr/bin/python3
 ''' Exhange Rate loader '''
 import argparse
+import concurrent.futures as cf
 import json
 import os
+import tempfile
+import pandas as pd
 import requests
 import backup_utility as bu
 import debug_control as dbc
 import interest_rates_interface_extended as rates_dbi
 
+CHUNK_SIZE = 64 * 1024
+TIMEOUT = 30.0
+
 
 def load_exchange_rates(options, dbg=False):
-    ''' excahge rate etractor '''
+    ''' excahge rate etractor -- long history ranges are split into windows of
+        url_control window_days fetched concurrently (at most options concurrency requests
+        in flight, options timeout seconds per request, default 30), each response is
+        streamed to disk, parsed & rates merged
+    '''
+    windows = calc_windows(options)
+    concurrency = (int(options["concurrency"]) if "concurrency" in options.keys() else 4)
+
+    with tempfile.TemporaryDirectory() as directory:
+        with cf.ThreadPoolExecutor(max_workers=max(min(concurrency, len(windows)), 1)) as pool:
+            results = list(pool.map(
+                lambda itm: fetch_window(options, itm[1], os.path.join(
+                    directory, "window_%d.json" % (itm[0])), dbg=dbg),
+                enumerate(windows)))
+
+    result_dict = merge_results(results)
+    if 'save_file' in options.keys():
+        with open(options['save_file'], 'w') as fp:
+            json.dump(result_dict, fp)
+        fp.close()
+
+    return result_dict
+
+def calc_windows(options):
+    ''' splits url_control start_date -- end_date into [(start, end)] windows of at most
+        window_days (single window [None] => request as specified)
+    '''
+    url_control = options['url_control'] if "url_control" in options.keys() else {}
+    if "window_days" not in url_control.keys() or not url_control['window_days'] or\
+            "start_date" not in url_control.keys() or "end_date" not in url_control.keys():
+        return [None]
+
+    start = pd.Timestamp(url_control['start_date'])
+    end = pd.Timestamp(url_control['end_date'])
+    step = pd.Timedelta(days=int(url_control['window_days']))
+
+    windows = []
+    while start <= end:
+        last = min(start + step - pd.Timedelta(days=1), end)
+        windows.append((start.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")))
+        start = last + pd.Timedelta(days=1)
+    return windows if windows else [None]
+
+def fetch_window(options, window, filename, dbg=False):
+    ''' requests single window (start, end) -- response streamed to filename & parsed '''
+    if window is not None:
+        options = options.copy()
+        options['url_control'] = options['url_control'].copy()
+        options['url_control']['start_date'], options['url_control']['end_date'] = window
 
     req_str = build_req_str(options, dbg=dbg)
     req = "/".join([options['url_control']['url'], req_str])
-    result = requests.get(req)
-
-    if result.ok:
-        if 'save_file' in options.keys():
-            with open(options['save_file'], 'wb') as fp:
-                for chunk in result.iter_content(10000):
-                    fp.write(chunk)
-            fp.close()
+    timeout = float(options["timeout"]) if "timeout" in options.keys() else TIMEOUT
+    with requests.get(req, stream=True, timeout=timeout) as result:
+        if not result.ok:
+            if dbg:
+                print(result.reason)
+            raise ValueError("Failed data extraction ")
 
-        result_dict = json.loads(result.content)
+        with open(filename, 'wb') as fp:
+            for chunk in result.iter_content(CHUNK_SIZE):
+                fp.write(chunk)
+        fp.close()
 
-    else:
-        if dbg:
-            print(result.reason)
-        raise ValueError("Failed data extraction ")
+    with open(filename, 'r') as fp:
+        result_dict = json.load(fp)
+    fp.close()
+    return result_dict
 
+def merge_results(results):
+    ''' merges window results (in window order) -- rates dicts combined, start_at / end_at
+        span all windows
+    '''
+    result_dict = results[0]
+    for itm in results[1:]:
+        if 'rates' in itm.keys() and isinstance(itm['rates'], dict):
+            result_dict.setdefault('rates', {}).update(itm['rates'])
+        if 'end_at' in itm.keys():
+            result_dict['end_at'] = itm['end_at']
     return result_dict
 
 def build_req_str(options, dbg=False):
@@ -70,6 +135,72 @@ def build_req_str(options, dbg=False):
     return req_str
 
 
+def normalize_options(options, verbose=0):
+    ''' Normalizes (JSON) options in place -- debug settings, items => dict & symbols,
+        returns dbg
+    '''
+    if verbose > 0:
+        options["verbose"] = verbose
+        dbg = True
+    else:
+        dbg = True
+        if "verbose" not in options.keys() and "debug_file" not in options.keys():
+            dbg = False
+            options["verbose"] = 0
+        elif "debug_file" in options.keys():
+            options["debug_file"] = bu.append_date_file(options["debug_file"])
+
+    if "items" in options.keys() and isinstance(options["items"], dict):
+        dict_items = options["items"].copy()
+
+        if "items" in options.keys():
+            options.pop("items", "")
+        options["items"] = {}
+        symbols_missing = False
+        if "symbols" not in options["url_control"].keys() or(\
+                "symbols" in options['url_control'].keys() and not
+                options['url_control']['symbols']):
+            options["url_control"]["symbols"] = []
+            symbols_missing = True
+
+        for key, val in dict_items.items():
+            options["items"][key] = val
+            if symbols_missing:
+                options['url_control']['symbols'].append(key)
+    else:
+        raise ValueError("Faulty Index list")
+
+    return dbg
+
+
+def calc_job_dates(options, db_interface, dbg=False):
+    ''' Updates url_control start_date (& end_date) based on current DB state -- returns
+        options used for extraction
+    '''
+    if not db_interface:
+        return options
+
+    options["url_control"]["start_date"] = db_interface.calc_start_date(
+        options["url_control"]["start_date"])
+
+    if "append" in options and options["append"] > 0 and "current_view" in options:
+        db_interface.options["url_control"]["start_date"] =\
+                db_interface.calc_most_recent_date(options["url_control"]["start_date"])
+
+        db_interface.options["url_control"]["start_date"] = bu.dt.datetime.strftime(
+            db_interface.options["url_control"]["start_date"], "%Y-%m-%d")
+
+        dbc.print_helper(("Updated start date " +
+                          db_interface.options["url_control"]["start_date"]),
+                         dbg=dbg)
+
+        max_date = db_interface.calc_max_date()
+        if max_date:
+            db_interface.options['url_control']['end_date'] = str(max_date)
+
+    return db_interface.options
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(
@@ -94,58 +225,14 @@ if __name__ == "__main__":
         else:
             raise ValueError("Options File Does not exist!!!")
 
-        if args.verbose > 0:
-            options["verbose"] = args.verbose
-            dbg = True
-        else:
-            dbg = True
-            if "verbose" not in options.keys() and "debug_file" not in options.keys():
-                dbg = False
-                options["verbose"] = 0
-            elif "debug_file" in options.keys():
-                options["debug_file"] = bu.append_date_file(options["debug_file"])
-
-        if "items" in options.keys() and isinstance(options["items"], dict):
-            dict_items = options["items"].copy()
-
-            if "items" in options.keys():
-                options.pop("items", "")
-            options["items"] = {}
-            symbols_missing = False
-            if "symbols" not in options["url_control"].keys() or(\
-                    "symbols" in options['url_control'].keys() and not
-                    options['url_control']['symbols']):
-                options["url_control"]["symbols"] = []
-                symbols_missing = True
-
-            for key, val in dict_items.items():
-                options["items"][key] = val
-                if symbols_missing:
-                    options['url_control']['symbols'].append(key)
-        else:
-            raise ValueError("Faulty Index list")
+        dbg = normalize_options(options, verbose=args.verbose)
 
         if not dryrun:
             db_interface = rates_dbi.rates_db_interface_extended(options, dryrun)
-            options["url_control"]["start_date"] = db_interface.calc_start_date(
-                options["url_control"]["start_date"])
         else:
             db_interface = None
 
-        if "append" in options and options["append"] > 0 and "current_view" in options:
-            db_interface.options["url_control"]["start_date"] =\
-                    db_interface.calc_most_recent_date(options["url_control"]["start_date"])
-
-            db_interface.options["url_control"]["start_date"] = bu.dt.datetime.strftime(
-                db_interface.options["url_control"]["start_date"], "%Y-%m-%d")
-
-            dbc.print_helper(("Updated start date " +
-                              db_interface.options["url_control"]["start_date"]),
-                             dbg=dbg)
-
-            max_date = db_interface.calc_max_date()
-            if max_date:
-                db_interface.options['url_control']['end_date'] = str(max_date)
+        calc_job_dates(options, db_interface, dbg=dbg)
 
     else:
         raise ValueError("Options Dictionary Provided")
@@ -159,4 +246,6 @@ if __name__ == "__main__":
             'rates' in result_dict.keys() and isinstance(result_dict['rates'], dict):
         bld = db_interface.db_dict_update(result_dict['rates'])
 
+    if db_interface:
+        db_interface.print_cache_stats()
         del db_interface
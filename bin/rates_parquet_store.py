@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+""" Exports table (or view) to / imports table from year partitioned Parquet store """
+import argparse
+import json
+import os
+import base_interest_rates_interface as biri
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Year partitioned Parquet export / import")
+    parser.add_argument("-c", "--chunk_size", default=100000, type=int)
+    parser.add_argument("-d", "--directory", required=True, type=str,
+                        help="Store directory (year=YYYY/part-N files)")
+    parser.add_argument("-f", "--format", default="parquet", type=str,
+                        help="parquet or arrow (memory mapped reads)")
+    parser.add_argument("-i", "--import_store", default=0, type=int,
+                        help="If > 0 loads store into options table (default export)")
+    parser.add_argument("-o", "--options", required=True, type=str)
+    parser.add_argument("-q", "--query", default=None, type=str,
+                        help="Export query (default SELECT * FROM options table)")
+    parser.add_argument("-y", "--years", default=None, type=str,
+                        help="Comma separated years imported (default all)")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.options):
+        raise ValueError("Options File Does not exist!!!")
+
+    with open(args.options, "r") as fp:
+        options = json.load(fp)
+    fp.close()
+
+    db_interface = biri.base_rates_db_interface(options, False)
+    if args.import_store > 0:
+        rows = db_interface.import_parquet(
+            args.directory,
+            years=([int(itm) for itm in args.years.split(",")] if args.years else None))
+        print("Imported %d rows" % (rows))
+    else:
+        counts = db_interface.export_parquet(args.directory, query=args.query,
+                                             chunk_size=args.chunk_size, fmt=args.format)
+        print("Exported %d rows, years %d" % (sum(counts.values()), len(counts)))
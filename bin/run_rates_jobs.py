@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+""" Runs many rate load jobs (options JSON files) in one process -- fetch stages run in
+    parallel, DB stages share the pool of mysql_db_class connections (pool_size)
+"""
+import argparse
+import concurrent.futures as cf
+import contextlib
+import json
+import os
+import threading
+import time
+import debug_control as dbc
+import fred_interface as fredi
+import load_exchange_rates as lex
+import base_interest_rates_interface as biri
+import interest_rates_interface_extended as rates_dbi
+
+
+@contextlib.contextmanager
+def db_connection(options, slots):
+    ''' opens backend for a DB stage -- mysql connections are drawn from the process wide
+        pool of mysql_db_class (options pool_size), slots bounds connections in use
+    '''
+    with slots:
+        conn = biri.connect_backend(options)
+        try:
+            yield conn
+        finally:
+            conn.close()        # returned to pool
+
+
+class rates_job():
+    ''' single options JSON job -- kind: fred, fred_update or exchange_rates
+
+        options (in addition to job specific options):
+        -- job:         kind (default: exchange_rates if url_control, fred_update if update
+                        else fred)
+        -- depends_on:  list of job names (options file names w/o .json) run beforehand
+    '''
+    def __init__(self, filename, dryrun=False, verbose=0):
+        with open(filename, "r") as fp:
+            self.options = json.load(fp)
+        fp.close()
+
+        self.filename = filename
+        self.name = os.path.splitext(os.path.basename(filename))[0]
+        self.dryrun = dryrun
+        self.verbose = verbose
+        self.depends_on = (list(self.options["depends_on"])
+                           if "depends_on" in self.options.keys() else [])
+
+        if "job" in self.options.keys():
+            self.kind = self.options["job"]
+        elif "url_control" in self.options.keys():
+            self.kind = "exchange_rates"
+        elif "update" in self.options.keys():
+            self.kind = "fred_update"
+        else:
+            self.kind = "fred"
+
+        if self.kind not in ("fred", "fred_update", "exchange_rates"):
+            raise ValueError("Unknown job type %s (%s)" % (self.kind, filename))
+
+    def run(self, slots):
+        ''' prepare (DB) -> fetch -> write (DB), connections are only held for DB stages '''
+        options = self.options
+        if self.kind == "exchange_rates":
+            dbg = lex.normalize_options(options, verbose=self.verbose)
+        else:
+            dbg = fredi.normalize_options(options, dryrun=self.dryrun, verbose=self.verbose)
+
+        db_class = (biri.base_rates_db_interface if self.kind == "fred" else
+                    rates_dbi.rates_db_interface_extended)
+        db_interface = None
+        if not self.dryrun:
+            with db_connection(options, slots) as conn:
+                db_interface = db_class(options, self.dryrun, mysql_conn=conn)
+                if self.kind == "exchange_rates":
+                    options = lex.calc_job_dates(options, db_interface, dbg=dbg)
+                else:
+                    fredi.calc_job_dates(options, db_interface, dbg=dbg)
+                db_interface.mysql_conn = None
+
+        if db_interface and isinstance(db_interface.dbg, dbc.debug_control):
+            dbg = db_interface.dbg
+
+        if self.kind == "exchange_rates":
+            result = lex.load_exchange_rates(options, dbg=dbg)
+        else:
+            result = fredi.fred_interface(options, dbg=dbg).df
+
+        if db_interface is None:
+            dbc.print_helper("Warning dryrun is set (%s)" % (self.name), dbg=dbg)
+            return 0
+
+        try:
+            with db_connection(options, slots) as conn:
+                db_interface.mysql_conn = conn
+                if self.kind == "exchange_rates" and result and 'rates' in result.keys():
+                    db_interface.db_dict_update(result['rates'])
+                elif self.kind != "exchange_rates" and result is not None and\
+                        result.shape[0] > 0 and result.shape[1] > 0:
+                    fredi.write_frame(db_interface, result,
+                                      update=(self.kind == "fred_update"))
+                else:
+                    dbc.print_helper("Faulty dataset (%s)" % (self.name), dbg=dbg)
+        finally:
+            db_interface.mysql_conn = None
+            db_interface.print_cache_stats()
+
+        return 0
+
+
+def calc_job_files(paths):
+    ''' expands directories into sorted *.json options files '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted([os.path.join(path, itm) for itm in os.listdir(path)
+                                 if itm.lower().endswith(".json")]))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            raise ValueError("Options file does not exist %s" % (path))
+    return files
+
+
+def run_jobs(jobs, workers=4, connections=2):
+    ''' runs jobs (respecting depends_on), returns {name: "ok" | error string} '''
+    names = {job.name: job for job in jobs}
+    for job in jobs:
+        missing = [itm for itm in job.depends_on if itm not in names.keys()]
+        if missing:
+            raise ValueError("Job %s depends on unknown job(s) %s" % (job.name, missing))
+
+    for job in jobs:
+        job.options["pool_size"] = max(connections, 1)
+    slots = threading.BoundedSemaphore(max(connections, 1))
+    status = {}
+    pending = list(jobs)
+    running = {}
+
+    with cf.ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        while pending or running:
+            ready = [job for job in pending
+                     if all([itm in status.keys() for itm in job.depends_on])]
+            while ready:
+                for job in ready:
+                    pending.remove(job)
+                    if all([status[itm] == "ok" for itm in job.depends_on]):
+                        running[executor.submit(job.run, slots)] = (job, time.perf_counter())
+                    else:
+                        status[job.name] = "skipped (failed dependency)"
+                ready = [job for job in pending
+                         if all([itm in status.keys() for itm in job.depends_on])]
+
+            if not running:
+                if pending:
+                    raise ValueError("Cyclic depends_on among %s" % (
+                        [job.name for job in pending]))
+                break
+
+            done, _ = cf.wait(list(running.keys()), return_when=cf.FIRST_COMPLETED)
+            for future in done:
+                job, start = running.pop(future)
+                try:
+                    future.result()
+                    status[job.name] = "ok"
+                except Exception as err:  # failed job must not stop remaining jobs
+                    status[job.name] = "failed: %s" % (err)
+                print("%s (%s): %s %.1fs" % (job.name, job.kind, status[job.name],
+                                             time.perf_counter() - start))
+
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many rate load jobs (options JSON)")
+    parser.add_argument("options", nargs="+", type=str,
+                        help="Options JSON files and/or directories of options JSON files")
+    parser.add_argument("-c", "--connections", default=2, type=int,
+                        help="Max DB connections in use (mysql_db_class pool_size)")
+    parser.add_argument("-d", "--dryrun", default=0, type=int)
+    parser.add_argument("-v", "--verbose", default=0, type=int)
+    parser.add_argument("-w", "--workers", default=4, type=int,
+                        help="Max jobs run in parallel")
+
+    args = parser.parse_args()
+
+    job_list = [rates_job(itm, dryrun=(args.dryrun > 0), verbose=args.verbose)
+                for itm in calc_job_files(args.options)]
+    run_jobs(job_list, workers=args.workers, connections=args.connections)
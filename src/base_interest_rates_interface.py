@@ -1,38 +1,48 @@
 #!/usr/bin/python3
 """ Basic Interface to FRED"""
+import itertools as it
+import json
+import os
 import sys
 import pandas as pd
 import numpy as np
 import debug_control as dbc
+import parquet_store as pqs
 import mysql_db_class as dbsql
+import rates_db_backend as rdb
 import sql_class_base as sbc
 import backup_utility as bu
 
+BACKENDS = ("mysql", "sqlite")
+
 
 class base_rates_db_interface():
     """ Base class too manage construction and insertion of Rate data """
-    def __init__(self, options, dryrun):
+    def __init__(self, options, dryrun, mysql_conn=None):
+        """ options: dictionary (JSON) specification, dryrun: no connection required,
+            mysql_conn: optional extant (shared) backend (mysql_db_class or
+            sqlalchemy_db_class, see connect_backend) used instead of connecting
+        """
         self.mysql_conn = None
         if options is not None and isinstance(options, dict):
             self.insert_query = None
+            self.insert_values = None
+            self.insert_frame = None
+            self.written = {}
             self.current_view_query = None
+            self.table_watermark = None
+            self.info_result = None
+            self.db_stats = {"round_trips": 0, "saved": 0}
 
             self.options = options.copy()
             self.dbg, self.print_dbg = bu.calc_debug_levels(self.options)
 
-            if "path" in options.keys() and "group" in options.keys():
-                self.mysql_conn = dbsql.mysql_db_class(path=options["path"],
-                                                       group=options["group"], password=None,
-                                                       db="Investing")
-                if self.mysql_conn is None:
-                    raise ValueError("Unable to connect to SQL Server (path)")
-            elif "password" in options and options["password"] != "":
-                self.mysql_conn = dbsql.mysql_db_class(user=options["user"],
-                                                       password=options["password"],
-                                                       host=options["db_host_ip"], db="Investing")
-
-                if self.mysql_conn is None:
-                    raise ValueError("Unable to connect to SQL Server (user + passw)")
+            if mysql_conn is not None:
+                if not isinstance(mysql_conn, rdb.rates_db_backend):
+                    raise ValueError("mysql_conn must implement rates_db_backend")
+                self.mysql_conn = mysql_conn
+            elif calc_has_login(options):
+                self.mysql_conn = connect_backend(options)
             elif dryrun:
                 dbc.error_helper("Warning -- running w dryrun", dbg=self.dbg)
 
@@ -56,6 +66,22 @@ class base_rates_db_interface():
             self.options["exclude_perc"] = (float(self.options["exclude_perc"])
                                             if "exclude_perc" in self.options.keys() else 0.295)
 
+            # insert_mode: literal (single INSERT statement), executemany (batched params) or
+            # load_data (LOAD DATA LOCAL INFILE from temporary csv)
+            self.options["insert_mode"] = (str(self.options["insert_mode"]).lower()
+                                           if "insert_mode" in self.options.keys() else
+                                           "literal")
+            self.options["batch_size"] = (int(self.options["batch_size"])
+                                          if "batch_size" in self.options.keys() else 1000)
+            self.options["commit_per_batch"] = (bool(self.options["commit_per_batch"])
+                                                if "commit_per_batch" in self.options.keys()
+                                                else False)
+
+            if self.calc_dialect() != "mysql" and self.options["insert_mode"] == "load_data":
+                dbc.print_helper("Warning -- load_data requires mysql (executemany)",
+                                 dbg=self.dbg)
+                self.options["insert_mode"] = "executemany"
+
         else:
             raise ValueError("Options must be of type dictionary")
 
@@ -66,12 +92,19 @@ class base_rates_db_interface():
         if isinstance(self.dbg, dbc.debug_control):
             self.dbg.close()
 
-    def construct_db_insert(self, df):
-        """ Constructs SQL statement from either data frame or dict(ionary)"""
+    def calc_dialect(self):
+        """ SQL dialect of backend (mysql if no connection) """
+        return self.mysql_conn.dialect if self.mysql_conn is not None else "mysql"
+
+    def construct_db_insert(self, df, filtered=True):
+        """ Constructs SQL statement from either data frame or dict(ionary), filtered: apply
+            calc_insert_mask (DataFrame), returns 0 in case of successful write
+        """
+        success = 1
         try:
             build_status = -1
             if isinstance(df, pd.DataFrame) and df.shape[0] >= 1:
-                build_status = self.db_dataframe_insert(df)
+                build_status = self.db_dataframe_insert(df, filtered=filtered)
             elif isinstance(df, dict):
                 build_status = self.db_dict_insert(df)
             else:
@@ -81,7 +114,23 @@ class base_rates_db_interface():
                 if self.dbg:
                     self.insert_query.print_q_str("SQL \n", dbg=self.dbg)
 
-                success = self.mysql_conn.insert(self.insert_query.get_query())
+                if self.insert_values is not None and self.options["insert_mode"] == "load_data":
+                    success = self.mysql_conn.load_data_local(
+                        self.insert_query.get_query(), self.insert_values,
+                        tmp_dir=(self.options["tmp_dir"] if "tmp_dir" in self.options.keys()
+                                 else None))
+                    self.insert_values = None
+                elif self.insert_values is not None:
+                    success = self.mysql_conn.insert_batches(
+                        self.insert_query.get_query(), self.insert_values,
+                        batch_size=self.options["batch_size"],
+                        commit_per_batch=self.options["commit_per_batch"])
+                    self.insert_values = None
+                else:
+                    success = self.mysql_conn.insert(self.insert_query.get_query())
+                self.invalidate_cache()
+                if success == 0 and self.insert_frame is not None:
+                    self.record_written(self.insert_frame)
                 dbc.print_helper(("SQL: construct_db_insert " + str(success)), dbg=self.dbg)
             else:
                 self.insert_query.print_q_str("construct_db_insert--failed", dbg=self.dbg)
@@ -90,54 +139,80 @@ class base_rates_db_interface():
         else:
             dbc.error_helper(("Failure" + str(sys.exc_info()[0])), None,
                              "construct_db_insert", dbg=self.dbg)
+        finally:
+            self.insert_frame = None
 
-    def db_dataframe_insert(self, df):
+        return success
+
+    def db_dataframe_insert(self, df, filtered=True):
         """ Constructs SQL insert from DataFRame"""
         build_status = -1
         if isinstance(df, pd.DataFrame) and not df.empty and self.insert_query:
-            self.insert_query.construct_insert_start(include_index=True)
-            self.insert_query.append_names(excludes=self.options["index_name"], append="")
-
-            # print_dbg = dbc.test_dbg(self.dbg)
-            not_triggered = True
-            print_dbg = False
-
-            for i, row in enumerate(df.iterrows()):
-                if  np.all(np.isnan(row[1])):
-                    dbc.print_helper(("Excluding " + str(row[0])), dbg=self.dbg)
-                elif np.isnan(row[1]).sum() / float(df.shape[1]) > self.options["exclude_perc"]:
-                    dbc.print_helper((" ".join(["Excluding (data @",
-                                                str(self.options["exclude_perc"]), ")",
-                                                str(row[0])])), dbg=self.dbg)
-
-                else:
-                    arr = row[1].to_numpy(copy=True)
-                    mn = np.mean(arr, axis=0)
-                    var = np.var(arr, axis=0)
-
-                    # TODO start coding here
-                    if mn < 0.0001 and var < 0.0001:
-                        dbc.print_helper(("Excluding (data @ {} {} {})".format(
-                            mn, var, str(row[0]))), dbg=self.dbg)
-                    else:
-                        if isinstance(self.insert_query.columns, (dict, sbc.co.OrderedDict)):
-                            base = self.insert_query.append_values_dict(row)
-                        else:
-                            base = self.insert_query.append_values_naive(row)
+            keep = (self.calc_insert_mask(df) if filtered else
+                    np.ones(df.shape[0], dtype=bool))
+            self.insert_frame = df[keep]
+            if keep.any() and self.options["insert_mode"] == "executemany":
+                self.insert_query.construct_insert_template(excludes=self.options["index_name"])
+                self.insert_values = self.iter_insert_params(df[keep])
+                build_status = 0
 
-                        insert = "\n" if not_triggered else ", \n"
-                        not_triggered = False
+            elif keep.any() and self.options["insert_mode"] == "load_data":
+                self.insert_query.construct_load_data(excludes=self.options["index_name"])
+                self.insert_values = self.iter_insert_params(df[keep])
+                build_status = 0
 
-                        if print_dbg:
-                            dbc.print_helper((str(i) + " " + base), dbg=self.dbg)
-                        self.insert_query.append_query_element(base, append=insert)
+            elif keep.any():
+                self.insert_query.construct_insert_start(include_index=True)
+                self.insert_query.append_names(excludes=self.options["index_name"], append="")
 
-            if not not_triggered:
+                self.insert_query.append_query_element(
+                    self.insert_query.encode_values_frame(df[keep], output="buffer"),
+                    append="\n")
                 self.insert_query.clean_query_element()
                 build_status = 0
 
         return build_status
 
+    def calc_insert_mask(self, df):
+        """ Calculates rows of DataFrame to write -- excludes all NaN rows, rows w/ NaN
+            share > exclude_perc & (near) zero mean / variance rows
+        """
+        vals = df.to_numpy(dtype=np.float64)
+        nan_cnt = np.isnan(vals).sum(axis=1)
+
+        all_nan = nan_cnt == vals.shape[1]
+        excl_perc = np.logical_and(~all_nan, nan_cnt / float(df.shape[1]) >
+                                   self.options["exclude_perc"])
+
+        # rows w/ any NaN have NaN mean / var => never caught by near-zero test
+        with np.errstate(invalid='ignore'):
+            mn = np.mean(vals, axis=1)
+            var = np.var(vals, axis=1)
+        near_zero = np.logical_and(mn < 0.0001, var < 0.0001)
+
+        for loc in np.flatnonzero(all_nan):
+            dbc.print_helper(("Excluding " + str(df.index[loc])), dbg=self.dbg)
+
+        for loc in np.flatnonzero(excl_perc):
+            dbc.print_helper((" ".join(["Excluding (data @",
+                                        str(self.options["exclude_perc"]), ")",
+                                        str(df.index[loc])])), dbg=self.dbg)
+
+        for loc in np.flatnonzero(near_zero):
+            dbc.print_helper(("Excluding (data @ {} {} {})".format(
+                mn[loc], var[loc], str(df.index[loc]))), dbg=self.dbg)
+
+        return ~(all_nan | excl_perc | near_zero)
+
+    def iter_insert_params(self, df):
+        """ Generates executemany parameters (tuples) from DataFrame, batch_size rows at a
+            time
+        """
+        for start in range(0, df.shape[0], self.options["batch_size"]):
+            for row in self.insert_query.append_params_frame(
+                    df.iloc[start:start + self.options["batch_size"]]):
+                yield row
+
     def db_dict_insert(self, df):
         """ Constructs SQL insert from python dictionary"""
         build_status = -1
@@ -170,68 +245,235 @@ class base_rates_db_interface():
         return build_status
 
     def db_vertical_insert(self, df):
-        """ Insert values into veritcal (tim-series) table"""
+        """ Insert values into veritcal (tim-series) table -- every column of df (melted) is
+            written as (date, id = column name, value[, source]) rows, NaN values excluded
+        """
         if isinstance(df, pd.DataFrame) and not df.empty and self.insert_query:
+            if len(self.options['columns']) > 4 and "keys" not in self.options.keys():
+                dbc.print_helper("Warning -- fails insert criteria", dbg=self.dbg)
+                return
+
             self.insert_query.construct_insert_start(True)
 
-            self.insert_query.append_names(self.options["index_name"], append="")
-            # TODO: start here
-            use_dict_ind = (len(self.options['columns']) > 4)
-            self.insert_query.append_insert_names(use_dict=use_dict_ind)
+            names = self.insert_query.append_names(self.options["index_name"], append="")
+            self.insert_query.append_insert_names(use_dict=False)
 
             self.insert_query.print_q_str("db_vertical init", dbg=self.dbg)
-            vals = []
-
-            for row in df.iterrows():
-                dt_val = row[0] if isinstance(row[0], str) else sbc.convert_timestamp(row[0])
-
-                if np.isnan(row[1][0]):
-                    dbc.print_helper(("Excluding: " + dt_val), dbg=self.dbg)
-                else:
-                    if len(self.options['columns']) == 4:
-                        res = (dt_val, df.columns[0], str(row[1][0]), self.options["source"])
-                    elif len(self.options['columns']) > 4 and "keys" in self.options.keys():
-                        res = self.options['columns'].copy()
-                        res[self.options['keys']['date']] = dt_val
-                        res[self.options['keys']['id']] = df.columns[0]
-                        res[self.options['keys']['value']] = str(row[1][0])
-                        # print("HERE -- vertical insert")
-                        # print(res.values())
-                    else:
-                        if self.dbg:
-                            print("Warning -- fails insert criteria")
-
-                    vals.append(res)
+            vals = self.calc_vertical_params(df, [self.options["index_name"]] + names)
 
             if self.mysql_conn is not None:
-                success = self.mysql_conn.insert_mutiple_rows(
-                    self.insert_query.get_query(), vals)
+                success = self.mysql_conn.insert_batches(
+                    self.insert_query.get_query(), vals,
+                    batch_size=self.options["batch_size"],
+                    commit_per_batch=self.options["commit_per_batch"])
+                self.invalidate_cache()
+                if success == 0:
+                    self.record_written(df)
                 dbc.print_helper(("SQL: db_vertical_insert " + str(success)), dbg=self.dbg)
             else:
                 dbc.print_helper(("SQL " + self.insert_query.get_query()), dbg=self.dbg)
                 print(vals)
 
+    def calc_is_vertical(self):
+        """ True if options columns specify vertical (date, id, value, ...) table layout """
+        return bool("columns" in self.options.keys() and
+                    isinstance(self.options["columns"], dict))
+
+    def calc_vertical_params(self, df, names):
+        """ Builds vertical insert rows (tuples ordered as names) column by column --
+            4 columns: (date, id, value, source), else options['columns'] defaults w/
+            options['keys'] date / id / value filled
+        """
+        dates = np.array(sbc.convert_timestamps(df.index), dtype=object)
+        if len(self.options['columns']) == 4:
+            keys = {"date": names[0], "id": names[1], "value": names[2]}
+            defaults = {names[3]: self.options["source"]}
+        else:
+            keys = self.options['keys']
+            defaults = self.options['columns']
+
+        vals = []
+        for name in df.columns:
+            arr = df[name].to_numpy()
+            mask = ~np.isnan(arr.astype(float))
+            if not mask.all():
+                dbc.print_helper(("Excluding: %s %d rows" % (name, (~mask).sum())),
+                                 dbg=self.dbg)
+
+            cols = {keys['date']: dates[mask].tolist(),
+                    keys['id']: it.repeat(name),
+                    keys['value']: arr[mask].astype(str).tolist()}
+            vals.extend(zip(*[cols[key] if key in cols.keys() else it.repeat(defaults[key])
+                              for key in names]))
+        return vals
+
+    def export_parquet(self, directory, query=None, chunk_size=100000, fmt="parquet"):
+        """ Exports table (or query / view) into year partitioned Parquet (or Arrow) store
+            streamed via query_iter, returns {year: rows}
+        """
+        if self.mysql_conn is None:
+            raise ValueError("Mysql Connection must be valid")
+
+        query = (query if query else
+                 "SELECT * FROM " + self.insert_query.get_table() + ";")
+        counts = pqs.write_partitions(
+            self.mysql_conn.query_iter(query, chunk_size=chunk_size), directory,
+            self.options["index_name"], fmt=fmt)
+
+        dbc.print_helper(("Exported %d rows (%s) to %s" % (
+            sum(counts.values()), ", ".join([str(key) for key in counts.keys()]), directory)),
+                         dbg=self.dbg)
+        return counts
+
+    def import_parquet(self, directory, years=None):
+        """ Bulk loads (years of) store via construct_db_insert (unfiltered, literal
+            insert_mode => executemany, single commit per year), returns rows loaded --
+            years failing to insert are not counted, vertical tables are not supported
+        """
+        if self.calc_is_vertical() or "keys" in self.options.keys():
+            raise ValueError("import_parquet requires wide table (options columns / keys)")
+
+        mode = self.options["insert_mode"]
+        commit_per_batch = self.options["commit_per_batch"]
+        if mode == "literal":
+            self.options["insert_mode"] = "executemany"
+        self.options["commit_per_batch"] = False
+
+        rename = {key: (val if val else key) for key, val in self.insert_query.columns.items()}
+        rows = 0
+        try:
+            for year in pqs.calc_years(directory):
+                if years is not None and year not in years:
+                    continue
+
+                df = pqs.read_partitions(directory, years=[year],
+                                         index_name=self.options["index_name"])
+                df = df.rename(columns=rename)[[rename[key] for key in rename.keys()
+                                                if key in df.columns]]
+                if self.construct_db_insert(df, filtered=False) == 0:
+                    rows += df.shape[0]
+                else:
+                    dbc.print_helper(("Warning -- import of %d failed (%d rows)" % (
+                        year, df.shape[0])), dbg=self.dbg)
+        finally:
+            self.options["insert_mode"] = mode
+            self.options["commit_per_batch"] = commit_per_batch
+
+        dbc.print_helper(("Imported %d rows from %s" % (rows, directory)), dbg=self.dbg)
+        return rows
+
+    def calc_series_watermarks(self):
+        """ Calculates per series high-water marks {item: "%Y-%m-%d"} -- read from
+            watermark_file (JSON) if specified else from table via single grouped MAX query
+        """
+        if "watermark_file" in self.options.keys():
+            watermarks = {}
+            if os.path.exists(self.options["watermark_file"]):
+                with open(self.options["watermark_file"], "r") as fp:
+                    watermarks = json.load(fp)
+                fp.close()
+            return watermarks
+
+        if self.mysql_conn is None:
+            raise ValueError("Mysql Connection must be valid")
+
+        watermarks = {}
+        if self.calc_is_vertical():
+            if "keys" in self.options.keys():
+                id_name = self.options['keys']['id']
+                date_name = self.options['keys']['date']
+            else:
+                date_name, id_name = list(self.options['columns'].keys())[:2]
+
+            res = self.mysql_conn.query(self.insert_query.calc_watermark_query(
+                id_name=id_name, date_name=date_name))
+            for row in res:
+                watermarks[row['series']] = row['watermark']
+        else:
+            res = self.mysql_conn.query(self.insert_query.calc_watermark_query())
+            if res:
+                for key, val in res[0].items():
+                    item = self.insert_query.columns[key]
+                    watermarks[item if item != '' else key] = val
+
+        return {key: (val if isinstance(val, str) else
+                      bu.dt.datetime.strftime(val, "%Y-%m-%d"))
+                for key, val in watermarks.items() if val is not None}
+
+    def record_written(self, df):
+        """ Records last non-NaN date per series of rows successfully written """
+        for item in df.columns:
+            last = df[item].last_valid_index()
+            if last is not None:
+                last = sbc.convert_timestamp(last) if not isinstance(last, str) else last
+                self.written[item] = (max(last, self.written[item]) if item in self.written
+                                      else last)
+
+    def save_series_watermarks(self):
+        """ Updates watermark_file (if specified) w/ last date per series actually written
+            (see record_written) -- failed / excluded rows never advance watermarks
+        """
+        if "watermark_file" not in self.options.keys() or not self.written:
+            return
+
+        watermarks = self.calc_series_watermarks()
+        for item, last in self.written.items():
+            watermarks[item] = max(last, watermarks[item]) if item in watermarks else last
+
+        with open(self.options["watermark_file"], "w") as fp:
+            json.dump(watermarks, fp, indent=4, sort_keys=True)
+        fp.close()
+
     def calc_start_date(self, start_date):
         """ Calculates Start Date (as max date + 1) """
         date = dbc.dt.datetime.now()
 
         if dbc.dt.datetime.strptime(start_date, "%Y-%m-%d") > date:
-            sql = "SELECT * FROM " + self.options["table"] + ";"
-            if self.mysql_conn is not None:
-                res = self.mysql_conn.query(sql)
-                if res:
-                    date_final = res[0]['index_date'] + dbc.dt.timedelta(days=1)
-                    date_final = dbc.dt.datetime.strftime(date_final, "%Y-%m-%d")
-                else:
-                    raise ValueError("Empty Result -- calc_start_date")
+            watermark = self.calc_table_watermark()
+            if watermark is not None:
+                date_final = watermark + dbc.dt.timedelta(days=1)
+                date_final = dbc.dt.datetime.strftime(date_final, "%Y-%m-%d")
             else:
-                raise ValueError("Mysql Connection must be valid")
+                raise ValueError("Empty Result -- calc_start_date")
         else:
             date_final = start_date
         return date_final
 
+    def calc_table_watermark(self):
+        """ Returns (cached) max index_name of table -- indexed MAX aggregate (single round
+            trip per interface until invalidated by write)
+        """
+        if self.table_watermark is None:
+            if self.mysql_conn is None:
+                raise ValueError("Mysql Connection must be valid")
+
+            index_name = self.insert_query.get_index_name()
+            self.table_watermark = self.mysql_conn.calc_watermark(
+                self.insert_query.get_table(),
+                index_name[0] if isinstance(index_name, list) else index_name)
+            self.db_stats["round_trips"] += 1
+        else:
+            self.db_stats["saved"] += 1
+        return self.table_watermark
+
+    def invalidate_cache(self):
+        """ Clears cached (info query / watermark) results -- required after writes """
+        self.table_watermark = None
+        self.info_result = None
+
+    def print_cache_stats(self):
+        """ Reports database round trips executed & saved by cached info results """
+        dbc.print_helper(("DB info queries: %d round trips, %d saved (cached)" % (
+            self.db_stats["round_trips"], self.db_stats["saved"])), dbg=self.dbg)
+
     def execute_info_query(self):
-        ''' executes query used to calculate start and end dates '''
+        ''' executes query used to calculate start and end dates -- result is cached until
+            invalidate_cache (called after writes)
+        '''
+        if self.info_result is not None:
+            self.db_stats["saved"] += 1
+            return self.info_result
+
         determine_periodicity = False
 
         if self.current_view_query.sql_type_ind is sbc.sql_type.SELECT:
@@ -245,6 +487,9 @@ class base_rates_db_interface():
         else:
             result = None
 
+        self.db_stats["round_trips"] += 1
+        if result:
+            self.info_result = (result, determine_periodicity)
         return result, determine_periodicity
 
     def calc_most_recent_date(self, current_max=None):
@@ -288,7 +533,11 @@ class base_rates_db_interface():
         return ret_value
 
     def calc_max_date(self):
-        ''' calculates maximum date based on view / sp '''
+        ''' calculates maximum date based on view / sp (table watermark if no view) '''
+        if not self.current_view_query:
+            watermark = self.calc_table_watermark()
+            return str(watermark) if watermark is not None else None
+
         result, _ = self.execute_info_query()
         ret_value = None
 
@@ -325,3 +574,65 @@ class base_rates_db_interface():
             value = result[0][self.options['index_name']]
 
         return value
+
+
+def calc_has_login(options):
+    """ Tests whether options include backend login -- MySQL (path + group or user +
+        password) or sqlite db_file
+    """
+    if calc_backend(options) == "sqlite":
+        return bool("db_file" in options.keys() and options["db_file"])
+    return bool(("path" in options.keys() and "group" in options.keys()) or
+                ("password" in options and options["password"] != ""))
+
+
+def calc_backend(options):
+    """ backend selected by options (mysql -- default, sqlite) """
+    backend = str(options["backend"]).lower() if "backend" in options.keys() else "mysql"
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend %s" % (backend))
+    return backend
+
+
+def connect_backend(options):
+    """ Constructs backend selected by options backend -- mysql: mysql_db_class (see
+        connect_mysql), sqlite: sqlalchemy_db_class (options db_file, stored procedures
+        emulated by options procedures {sp_name: SELECT statement / view name}), both
+        implement rates_db_backend
+    """
+    if calc_backend(options) == "sqlite":
+        import sql_alchemy_class as sac  # optional dependency (sqlalchemy)
+
+        conn = sac.sqlalchemy_db_class(path=options["db_file"], password=None)
+        if "procedures" in options.keys() and isinstance(options["procedures"], dict):
+            conn.register_procedures(options["procedures"])
+        return conn
+    return connect_mysql(options)
+
+
+def connect_mysql(options):
+    """ Constructs mysql_db_class (options db, default Investing) based on options login
+        specification
+    """
+    local_infile = bool("insert_mode" in options.keys() and
+                        str(options["insert_mode"]).lower() == "load_data")
+    # pool_size => connections shared (process wide) by interfaces w/ same login
+    pool_size = int(options["pool_size"]) if "pool_size" in options.keys() else None
+    db_name = options["db"] if "db" in options.keys() else "Investing"
+
+    if "path" in options.keys() and "group" in options.keys():
+        mysql_conn = dbsql.mysql_db_class(path=options["path"], group=options["group"],
+                                          password=None, db=db_name,
+                                          local_infile=local_infile, pool_size=pool_size)
+        if mysql_conn is None:
+            raise ValueError("Unable to connect to SQL Server (path)")
+    elif "password" in options and options["password"] != "":
+        mysql_conn = dbsql.mysql_db_class(user=options["user"], password=options["password"],
+                                          host=options["db_host_ip"], db=db_name,
+                                          local_infile=local_infile, pool_size=pool_size)
+        if mysql_conn is None:
+            raise ValueError("Unable to connect to SQL Server (user + passw)")
+    else:
+        raise ValueError("Options dict does not meet requirements")
+
+    return mysql_conn
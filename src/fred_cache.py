@@ -0,0 +1,213 @@
+#!/usr/bin/python3
+""" Local on-disk cache of FRED observations (used by fred_interface) """
+import contextlib
+import importlib.util
+import json
+import os
+import threading
+import time
+import pandas as pd
+
+try:
+    import fcntl    # index file lock (POSIX)
+except ImportError:
+    fcntl = None
+
+# parquet / feather support (pyarrow) -- probed without importing
+DEFAULT_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") is not None else "pickle"
+
+
+class fred_cache():
+    ''' stores series observations keyed by series id & observation range
+
+        =====================================================
+        options:  dictionary
+        -- directory:   cache location (required)
+        -- ttl:         max age (seconds) of cached entry (default None => no expiry)
+        -- open_ttl:    max age (seconds) of open-ended (no end date) entries (default 43200),
+                        capped by ttl
+        -- max_mb:      size bound of cache, least recently used entries evicted (default None)
+        -- vintage:     if > 0 entries are invalidated when FRED last_updated changes
+        -- format:      parquet, feather or pickle (default parquet if pyarrow available)
+    '''
+    INDEX_FILE = "fred_cache_index.json"
+
+    def __init__(self, options):
+        if not options or not isinstance(options, dict) or "directory" not in options.keys():
+            raise ValueError("fred_cache requires options w/ directory")
+
+        self.directory = options["directory"]
+        self.ttl = float(options["ttl"]) if "ttl" in options.keys() and options["ttl"] else None
+        self.open_ttl = (float(options["open_ttl"]) if "open_ttl" in options.keys() and
+                         options["open_ttl"] else 43200.0)
+        if self.ttl is not None:
+            self.open_ttl = min(self.open_ttl, self.ttl)
+        self.max_bytes = (float(options["max_mb"]) * 1024 * 1024
+                          if "max_mb" in options.keys() and options["max_mb"] else None)
+        self.vintage = bool("vintage" in options.keys() and options["vintage"])
+        self.fmt = options["format"] if "format" in options.keys() else DEFAULT_FORMAT
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_file = os.path.join(self.directory, self.INDEX_FILE)
+        self.index = {}
+        with self.locked():
+            self.index = self.load_index()
+
+    @contextlib.contextmanager
+    def locked(self):
+        ''' serializes index access -- threads (lock) & processes / instances sharing
+            directory (lock file)
+        '''
+        with self.lock:
+            with open(self.index_file + ".lock", "a") as fp:
+                if fcntl is not None:
+                    fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+    def load_index(self):
+        ''' reads index file merged w/ local access times (index file is authoritative for
+            entries -- requires locked)
+        '''
+        index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r") as fp:
+                index = json.load(fp)
+            fp.close()
+
+        for key, entry in index.items():
+            if key in self.index.keys():
+                entry["accessed"] = max(entry["accessed"], self.index[key]["accessed"])
+        return index
+
+    @staticmethod
+    def calc_key(series, start=None, end=None):
+        ''' cache key -- series id + observation range '''
+        start = "open" if start is None else pd.Timestamp(start).strftime("%Y%m%d")
+        end = "open" if end is None else pd.Timestamp(end).strftime("%Y%m%d")
+        return "_".join([str(series), start, end])
+
+    def get(self, series, start=None, end=None, last_updated=None):
+        ''' returns cached pd.Series or None (miss / expired / stale vintage) '''
+        key = self.calc_key(series, start, end)
+        with self.locked():
+            self.index = self.load_index()
+            entry = self.index[key] if key in self.index.keys() else None
+            if entry and self.is_valid(entry, last_updated, open_end=(end is None)):
+                try:
+                    data = self.read(entry["file"])
+                    entry["accessed"] = time.time()
+                    self.hits += 1
+                    return data
+                except (OSError, ValueError):
+                    self.remove(key)
+                    self.write_index()
+            elif entry:
+                self.remove(key)
+                self.write_index()
+
+            self.misses += 1
+        return None
+
+    def put(self, series, data, start=None, end=None, last_updated=None):
+        ''' stores pd.Series, evicting least recently used entries beyond max_mb '''
+        key = self.calc_key(series, start, end)
+        filename = os.path.join(self.directory, ".".join([key, self.fmt]))
+        with self.locked():
+            self.index = self.load_index()
+            self.write(data, filename)
+            now = time.time()
+            self.index[key] = {"file": filename, "created": now, "accessed": now,
+                               "size": os.path.getsize(filename),
+                               "last_updated": last_updated}
+            self.evict()
+            self.write_index()
+
+    def is_valid(self, entry, last_updated=None, open_end=False):
+        ''' tests entry against ttl (open_ttl if open_end) & (if vintage) FRED
+            last_updated
+        '''
+        ttl = self.open_ttl if open_end else self.ttl
+        if ttl is not None and time.time() - entry["created"] > ttl:
+            return False
+        if self.vintage and last_updated is not None and\
+                entry["last_updated"] != last_updated:
+            return False
+        return os.path.exists(entry["file"])
+
+    def evict(self):
+        ''' removes orphaned files & least recently used entries until cache size <= max_mb
+            (requires locked)
+        '''
+        files = set([entry["file"] for entry in self.index.values()])
+        for itm in os.listdir(self.directory):
+            path = os.path.join(self.directory, itm)
+            if itm.endswith("." + self.fmt) and path not in files:
+                os.remove(path)
+
+        if self.max_bytes is None:
+            return
+
+        total = sum([entry["size"] for entry in self.index.values()])
+        for key in sorted(self.index.keys(), key=lambda k: self.index[k]["accessed"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.index[key]["size"]
+            self.remove(key)
+            self.evictions += 1
+
+    def remove(self, key):
+        ''' drops entry (and file) from cache '''
+        entry = self.index.pop(key, None)
+        if entry and os.path.exists(entry["file"]):
+            os.remove(entry["file"])
+
+    def read(self, filename):
+        ''' reads cached series '''
+        if self.fmt == "parquet":
+            df = pd.read_parquet(filename)
+        elif self.fmt == "feather":
+            df = pd.read_feather(filename).set_index("index")
+        else:
+            df = pd.read_pickle(filename)
+        return df.iloc[:, 0]
+
+    def write(self, data, filename):
+        ''' writes series (as single column frame) '''
+        df = data.to_frame(name=(data.name if data.name is not None else "value"))
+        if self.fmt == "parquet":
+            df.to_parquet(filename)
+        elif self.fmt == "feather":
+            df.rename_axis("index").reset_index().to_feather(filename)
+        else:
+            df.to_pickle(filename)
+
+    def save_index(self):
+        ''' persists cache index (merged w/ index file) '''
+        with self.locked():
+            self.index = self.load_index()
+            self.write_index()
+
+    def write_index(self):
+        ''' writes cache index atomically (requires locked) '''
+        tmp_file = self.index_file + ".tmp"
+        with open(tmp_file, "w") as fp:
+            json.dump(self.index, fp)
+        fp.close()
+        os.replace(tmp_file, self.index_file)
+
+    def stats(self):
+        ''' hit / miss / eviction counters '''
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self.index)}
+
+    def __repr__(self):
+        return "fred_cache(%s): %s" % (self.directory, self.stats())
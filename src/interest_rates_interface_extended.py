@@ -10,10 +10,23 @@ import base_interest_rates_interface as biri
 
 class rates_db_interface_extended(biri.base_rates_db_interface):
     """ Base class too manage construction and insertion of Rate data """
-    def __init__(self, options, dryrun):
-        super().__init__(options, dryrun)
+    def __init__(self, options, dryrun, mysql_conn=None):
+        super().__init__(options, dryrun, mysql_conn=mysql_conn)
 
         self.sql_update = biri.sbc.sql_query_base(self.options, q_str="UPDATE")
+
+        # update_mode: cell (UPDATE per NULL cell), upsert (INSERT ... ON DUPLICATE KEY UPDATE)
+        # staging (temporary table + UPDATE ... JOIN) or diff (inserts + revised / filled
+        # cells only, see construct_db_diff)
+        self.options["update_mode"] = (str(self.options["update_mode"]).lower()
+                                       if "update_mode" in self.options.keys() else "cell")
+        if self.calc_dialect() != "mysql" and self.options["update_mode"] == "staging":
+            self.options["update_mode"] = "upsert"
+        if self.options["update_mode"] in ("upsert", "diff") and self.mysql_conn is not None:
+            self.check_upsert_key()
+        self.options["diff_tolerance"] = (float(self.options["diff_tolerance"])
+                                          if "diff_tolerance" in self.options.keys() else 1e-9)
+        self.diff_stats = {"inserts": 0, "updates": 0, "cells": 0, "noops": 0}
         if self.print_dbg:
             print("Completed Initialization")
 
@@ -24,15 +37,32 @@ class rates_db_interface_extended(biri.base_rates_db_interface):
         if isinstance(self.dbg, dbc.debug_control):
             self.dbg.close()
 
+    def check_upsert_key(self):
+        """ upsert requires primary / unique key on index_name (see calc_upsert_query) --
+            falls back to cell updates, diff mode raises ValueError
+        """
+        index_name = self.sql_update.get_index_name()
+        if self.mysql_conn.calc_has_unique_key(self.sql_update.get_table(), index_name):
+            return
+
+        if self.options["update_mode"] == "diff":
+            raise ValueError("update_mode diff requires unique key on " + index_name)
+        dbc.print_helper(("Warning -- upsert requires unique key on %s (cell)" % (index_name)),
+                         dbg=self.dbg)
+        self.options["update_mode"] = "cell"
+
     def construct_db_insert_update(self, df):
         """ Constructs SQL statement from either data frame or dict(ionary)"""
+        if self.options["update_mode"] == "diff" and isinstance(df, pd.DataFrame):
+            return self.construct_db_diff(df)
+
         df_new = None
         try:
             build_status = -1
-            current_df = self.mysql_conn.query(self.options['current_view']['query'])
-            if isinstance(current_df, list) and current_df:
-                current_df = pd.DataFrame(current_df)
-                current_df.index = current_df[self.options['index_name']]
+            current_df = self.mysql_conn.query_frame(self.options['current_view']['query'],
+                                                     index_col=self.options['index_name'])
+            if current_df.empty:
+                raise ValueError("Empty current_view (construct_db_insert_update)")
 
             if isinstance(df, pd.DataFrame) and df.shape[0] >= 1:
                 max_date = current_df.iloc[0][self.options['current_view']['max_date']]
@@ -40,45 +70,21 @@ class rates_db_interface_extended(biri.base_rates_db_interface):
                     if self.print_dbg:
                         print("Warning max_date is none")
 
-                    max_date = max(current_df.index_date)
+                    max_date = max(current_df.index)
 
                 if self.print_dbg:
                     print("Max Date: %s" % (max_date))
 
-                new_ind = np.logical_and(df.index.year == max_date.year,
-                                         df.index.month > max_date.month)
-                new_ind = np.logical_or(df.index.year > max_date.year, new_ind)
-
-                new_ind2 = np.logical_and(df.index.year == max_date.year,
-                                          df.index.month == max_date.month)
-
-                new_ind2 = np.logical_and(new_ind2, df.index.day > max_date.day)
-
-                new_ind = np.logical_or(new_ind, new_ind2)
-
-                old_ind2 = np.logical_and(df.index.year == max_date.year,
-                                          df.index.month < max_date.month)
-                old_ind2 = np.logical_or(old_ind2, df.index.year < max_date.year)
-
-                old_ind3 = np.logical_and(df.index.year == max_date.year,
-                                          df.index.month == max_date.month)
-                old_ind3 = np.logical_and(old_ind3, df.index.day <= max_date.day)
-
-                old_ind2 = np.logical_or(old_ind2, old_ind3)
-
-                old_ind = np.logical_and(df.index > self.options['start_date'],
-                                         old_ind2)
-
-                df_new = df[new_ind]
-                df_old = pd.merge(df[old_ind], current_df, how='left', left_index=True,
-                                  right_index=True)
+                df_new, df_old = self.split_new_old(df, max_date)
+                df_old = pd.merge(df_old, self.calc_overlap(current_df, df_old), how='left',
+                                  left_index=True, right_index=True)
                 if self.print_dbg:
                     print("here")
-                    print(df_old.shape, df_new.shape, len(old_ind2), old_ind2.sum(),
-                          old_ind.sum())
+                    print(df_old.shape, df_new.shape)
 
                 if self.mysql_conn is not None:
                     build_status = self.db_dataframe_update(df_old)
+                    self.invalidate_cache()
                     if self.print_dbg:
                         print("Update Status %d" % (build_status))
                     self.construct_db_insert(df_new)
@@ -95,12 +101,140 @@ class rates_db_interface_extended(biri.base_rates_db_interface):
 
         return df_new
 
+    def construct_db_diff(self, df):
+        """ Diff stage -- compares df against stored values of its date window (within
+            diff_tolerance): new rows are inserted, rows w/ revised or NULL cells upserted
+            (changed cells only), unchanged rows (no-ops) skipped, returns inserted rows
+        """
+        df_new = None
+        try:
+            if self.mysql_conn is None:
+                raise ValueError("Mysql Connection must be valid")
+
+            if not isinstance(df, pd.DataFrame) or df.empty:
+                raise ValueError("Error (construct_db_diff)")
+
+            df_new, names, vals = self.calc_diff(df)
+            stats = {"inserts": df_new.shape[0], "updates": len(vals),
+                     "cells": sum([sum([val is not None for val in row[1:]]) for row in vals]),
+                     "noops": df.shape[0] - df_new.shape[0] - len(vals)}
+
+            if vals:
+                build_status = self.mysql_conn.upsert(
+                    self.sql_update.get_table(), self.sql_update.get_index_name(), names, vals,
+                    overwrite=True, batch_size=self.options["batch_size"])
+                self.invalidate_cache()
+                if self.print_dbg:
+                    print("Update Status %d" % (build_status))
+
+            if not df_new.empty:
+                self.construct_db_insert(df_new)
+
+            for key, val in stats.items():
+                self.diff_stats[key] += val
+            dbc.print_helper(("Diff: %d inserts, %d updates (%d cells), %d no-ops" % (
+                stats["inserts"], stats["updates"], stats["cells"], stats["noops"])),
+                             dbg=self.dbg)
+        except ValueError as v:
+            print("Failed Update {}".format(v))
+        except biri.dbsql.mysqldb.Error as err:
+            print("Failed Update: {}".format(err))
+
+        return df_new
+
+    def calc_diff(self, df):
+        """ Calculates (inserts, names, rows) -- inserts: rows of df not stored, rows:
+            (date, val_1, ..., val_n) of stored rows w/ changed cells (None => unchanged)
+        """
+        pairs = [(key, val) for key, val in self.insert_query.columns.items()
+                 if val in df.columns]
+        if not pairs:
+            raise ValueError("No columns of df found in table (calc_diff)")
+
+        names = [key for key, _ in pairs]
+        dates = biri.sbc.convert_timestamps(df.index)
+        current_df = self.mysql_conn.query_frame(
+            self.sql_update.calc_window_query(names), (min(dates), max(dates)))
+
+        if current_df.empty:
+            return df, names, []
+
+        stored = pd.Index(biri.sbc.convert_timestamps(
+            pd.to_datetime(current_df[self.options['index_name']])))
+        pos = stored.get_indexer(dates)
+        exists = pos >= 0
+
+        tol = self.options["diff_tolerance"]
+        any_change = np.zeros(exists.sum(), dtype=bool)
+        cols = []
+        for key, val in pairs:
+            new = df[val].to_numpy(dtype=np.float64)[exists]
+            old = current_df[key].to_numpy(dtype=np.float64)[pos[exists]]
+            change = np.logical_and(~np.isnan(new), np.logical_or(
+                np.isnan(old), np.abs(new - old) > tol))
+
+            col = new.astype(object)
+            col[~change] = None
+            cols.append(col)
+            any_change = np.logical_or(any_change, change)
+
+        upd_dates = np.array(dates, dtype=object)[exists][any_change]
+        return (df[~exists], names,
+                list(zip(upd_dates.tolist(), *[col[any_change].tolist() for col in cols])))
+
+    def print_cache_stats(self):
+        """ Reports database round trips (see base class) & per run diff counts """
+        super().print_cache_stats()
+        if self.options["update_mode"] == "diff":
+            dbc.print_helper(("Diff totals: %d inserts, %d updates (%d cells), %d no-ops" % (
+                self.diff_stats["inserts"], self.diff_stats["updates"],
+                self.diff_stats["cells"], self.diff_stats["noops"])), dbg=self.dbg)
+
+    def split_new_old(self, df, max_date):
+        """ Splits df into (new, old) rows -- new: dates after max_date (day resolution),
+            old: dates in (start_date, max_date], binary search on sorted index
+        """
+        idx = pd.DatetimeIndex(df.index)
+        cut = np.datetime64(pd.Timestamp(max_date).normalize() + pd.Timedelta(days=1))
+        start = (self.options['start_date'] if 'start_date' in self.options.keys() else None)
+        start = np.datetime64(pd.Timestamp(start)) if start is not None else None
+
+        if idx.is_monotonic_increasing:
+            hi_pos = idx.searchsorted(cut, side="left")
+            lo_pos = idx.searchsorted(start, side="right") if start is not None else 0
+            return df.iloc[hi_pos:], df.iloc[lo_pos:max(lo_pos, hi_pos)]
+
+        dates = idx.to_numpy()
+        old_ind = dates < cut
+        if start is not None:
+            old_ind = np.logical_and(old_ind, dates > start)
+        return df[dates >= cut], df[old_ind]
+
+    @staticmethod
+    def calc_overlap(current_df, df):
+        """ rows of current_df within date range of df (all rows if range not comparable) """
+        if df.empty:
+            return current_df.iloc[0:0]
+
+        try:
+            dates = pd.to_datetime(current_df.index).to_numpy()
+        except (TypeError, ValueError):
+            return current_df
+
+        first = np.datetime64(pd.Timestamp(df.index.min()).normalize())
+        last = np.datetime64(pd.Timestamp(df.index.max()))
+        return current_df[np.logical_and(dates >= first, dates <= last)]
+
     def db_dataframe_update(self, df):
         """ Constructs SQL UPDATE from DataFRame, assumes current and new merged into
             single table
         """
         build_status = -1
-        if isinstance(df, pd.DataFrame) and not df.empty:
+        if isinstance(df, pd.DataFrame) and not df.empty and\
+                self.options["update_mode"] in ("upsert", "staging"):
+            build_status = self.db_dataframe_upsert(df)
+
+        elif isinstance(df, pd.DataFrame) and not df.empty:
             build_status = 0
 
             for item in df.iterrows():
@@ -134,39 +268,99 @@ class rates_db_interface_extended(biri.base_rates_db_interface):
 
         return build_status
 
+    def db_dataframe_upsert(self, df):
+        """ Set based equivalent of db_dataframe_update -- fills NULL cells of extant rows
+            via batched upsert or staged UPDATE ... JOIN (single transaction)
+        """
+        names, vals = self.calc_update_params(df)
+        if not vals:
+            return 0
+
+        if self.print_dbg:
+            print("Upsert (%s) %d rows %s" % (self.options["update_mode"], len(vals), names))
+
+        if self.options["update_mode"] == "staging":
+            stage = "stage_" + self.sql_update.get_table().split(".")[-1]
+            build_status = self.mysql_conn.staged_update(
+                self.sql_update.calc_staging_queries(names, stage), vals,
+                batch_size=self.options["batch_size"])
+        else:
+            build_status = self.mysql_conn.upsert(
+                self.sql_update.get_table(), self.sql_update.get_index_name(), names, vals,
+                batch_size=self.options["batch_size"])
+
+        return build_status
+
+    def calc_update_params(self, df):
+        """ Calculates (names, rows) of NULL cells to fill -- rows are (date, val_1, ...,
+            val_n) w/ None where no fill is required, rows without fills are dropped
+        """
+        pairs = [(key, value) for key, value in self.options['items'].items()
+                 if key in df.columns and value in df.columns]
+        if not pairs:
+            return [], []
+
+        if self.options['index_name'] in df.columns:
+            exists = df[self.options['index_name']].notna().to_numpy()
+        else:
+            exists = np.ones(df.shape[0], dtype=bool)
+
+        any_fill = np.zeros(df.shape[0], dtype=bool)
+        cols = []
+        for key, value in pairs:
+            new = df[key].to_numpy(dtype=np.float64)
+            fill = np.logical_and(~np.isnan(new),
+                                  np.isnan(df[value].to_numpy(dtype=np.float64)))
+            fill = np.logical_and(fill, exists)
+
+            col = new.astype(object)
+            col[~fill] = None
+            cols.append(col)
+            any_fill = np.logical_or(any_fill, fill)
+
+        dates = [biri.bu.dt.date(itm.year, itm.month, itm.day) for itm in df.index[any_fill]]
+        return ([value for _, value in pairs],
+                list(zip(dates, *[col[any_fill].tolist() for col in cols])))
+
     def db_dict_update(self, dict_res):
-        """ Constructs SQL UPDATE from DataFRame, assumes current and new merged into
-            single table
+        """ Constructs SQL UPDATE from dict {date: {item: rate}} -- all rows executed as
+            single batched executemany (one transaction)
         """
         build_status = -1
         if dict_res and isinstance(dict_res, dict):
-            build_status = 0
             q_str = self.sql_update.q_str
-
-            for key, row in dict_res.items():
-                try:
-                    write_dict = row.copy()
-                    if isinstance(key, dt.datetime):
-                        write_dict['index'] = dt.datetime.strftime(key, "%Y-%m-%d")
-                    else:
-                        write_dict['index'] = key
-
-                    if self.print_dbg:
-                        print("%s -- %f %f %f %f %f \n %s" % (
-                            key, write_dict['CAD'], write_dict['EUR'], write_dict['GBP'],
-                            write_dict['JPY'], write_dict['CNY'], q_str))
-
-                    build_status += self.mysql_conn.update(
-                        q_str, write_dict)
-
-                except ValueError as v:
-                    print("Failed Update {}".format(v))
-                    continue
-                except biri.dbsql.mysqldb.Error as err:
-                    print("Failed Update: {}".format(err))
-                    continue
-                #else:
-                #    if self.print_dbg:
-                #        print("Not found %s" % (key))
-
+            vals = self.calc_dict_params(dict_res)
+
+            if self.print_dbg:
+                print("Update %d rows \n %s" % (len(vals), q_str))
+                items = (list(self.options['items'].keys()) if "items" in self.options.keys()
+                         else [])
+                for row in vals:
+                    print("%s -- %s" % (row['index'], " ".join(
+                        ["%s %s" % (key, row[key]) for key in items if key in row.keys()])))
+
+            try:
+                build_status = self.mysql_conn.insert_batches(
+                    q_str, vals, batch_size=self.options["batch_size"], commit_per_batch=False)
+            except ValueError as v:
+                print("Failed Update {}".format(v))
+
+            self.invalidate_cache()
         return build_status
+
+    @staticmethod
+    def calc_dict_params(dict_res):
+        """ Calculates executemany parameters -- row dicts w/ index (%Y-%m-%d) added """
+        vals = []
+        for key, row in dict_res.items():
+            if not isinstance(row, dict):
+                print("Failed Update {}".format(key))
+                continue
+
+            write_dict = row.copy()
+            if isinstance(key, dt.datetime):
+                write_dict['index'] = dt.datetime.strftime(key, "%Y-%m-%d")
+            else:
+                write_dict['index'] = key
+            vals.append(write_dict)
+        return vals
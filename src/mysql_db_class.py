@@ -1,29 +1,50 @@
 """ Class wrapper around the python interface to mysql database """
 #!/usr/bin/python3
 # import MySQLdb as mysqldb
+import contextlib
+import csv
+import hashlib
+import itertools as it
+import os
+import tempfile
+import threading
+import pandas as pd
 import mysql.connector as mysqldb
 from mysql.connector import errorcode
+from mysql.connector import pooling
 import myloginpath
+import rates_db_backend as rdb
+import sql_class_base as sbc
 
+# process wide connection pools keyed by connection arguments (login group / host / db)
+POOLS = {}
+POOLS_LOCK = threading.Lock()
 
-class mysql_db_class():
+
+class mysql_db_class(rdb.rates_db_backend_base):
     """ Simple class wrapping access to mysql database """
+    driver_error = mysqldb.Error
 
     def __init__(self, path="/home/spennington/.mylogin.cnf", group="remote", password=None,
-                 host="localhost", user="spennington", db="jobsearch"):
+                 host="localhost", user="spennington", db="jobsearch", local_infile=False,
+                 pool_size=None):
+        """ pool_size: if set connections are drawn from (shared) MySQLConnectionPool """
         self.connection = None
+        self.cursor = None
+        self.dict_cursor = None
         self.host = host
         self.user = user
         self.database = db
         self.port = 3306
+        self.dialect = "mysql"
 
         if password is None and path and isinstance(path, str) and\
                 path.find('mylogin.cnf') < 0:
-            self.connection = mysqldb.connect(option_files=path, option_groups=group,
-                                              use_unicode=True, charset="utf8",
-                                              collation="utf8_general_ci",
-                                              use_pure=True,
-                                              db=self.database)
+            self.connection = self.connect(
+                {"option_files": path, "option_groups": group, "use_unicode": True,
+                 "charset": "utf8", "collation": "utf8_general_ci", "use_pure": True,
+                 "allow_local_infile": local_infile, "db": self.database},
+                pool_size=pool_size)
         else:
             if password is None and path and isinstance(path, str) and\
                 path.find('mylogin.cnf') >= 0:
@@ -42,9 +63,11 @@ class mysql_db_class():
             # conf['password'] = conf['password'].replace("\"", '')
             # conf['password'] = conf['password'].encode(encoding='utf-8')
             try:
-                self.connection = mysqldb.connect(
-                    user=self.user, host=self.host, password=password,
-                    port=self.port, use_pure=False, ssl_disabled=True, db=self.database)
+                self.connection = self.connect(
+                    {"user": self.user, "host": self.host, "password": password,
+                     "port": self.port, "use_pure": False, "ssl_disabled": True,
+                     "db": self.database, "allow_local_infile": local_infile},
+                    pool_size=pool_size)
             except mysqldb.Error as err:
                 if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
                     print('(1): ')
@@ -59,13 +82,56 @@ class mysql_db_class():
         if self.database is not None:
             self.cursor.execute("USE " + self.database + ";")
 
+    @staticmethod
+    def connect(conn_args, pool_size=None):
+        """ Opens connection -- drawn from process wide pool (keyed by conn_args) if
+            pool_size
+        """
+        if not pool_size:
+            return mysqldb.connect(**conn_args)
+
+        key = hashlib.sha1(repr(sorted(conn_args.items())).encode("utf-8")).hexdigest()
+        with POOLS_LOCK:
+            if key not in POOLS.keys():
+                POOLS[key] = pooling.MySQLConnectionPool(
+                    pool_name="mysql_db_class_" + key[:16], pool_size=int(pool_size),
+                    **conn_args)
+        return POOLS[key].get_connection()
+
+    def get_dict_cursor(self):
+        """ returns (reused) MySQLCursorDict """
+        if self.dict_cursor is None:
+            self.dict_cursor = self.connection.cursor(dictionary=True)
+        return self.dict_cursor
+
+    def close(self):
+        """ Closes cursors & connection (returned to pool if pooled) """
+        for cursor in (self.dict_cursor, self.cursor):
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except mysqldb.Error as err:
+                    print("Failed Close: {}".format(err))
+        self.dict_cursor = None
+        self.cursor = None
+
+        if self.connection:
+            self.connection.close()
+        self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def insert(self, query, params_tuple=None):
         """ Simple insert query -- with roll back in case of failure , returns 1
             in case of success 0
         """
         success = 1
         try:
-            cursor = self.connection.cursor()
+            cursor = self.cursor
             if isinstance(query, str) and params_tuple is None:
                 print("Warning -- SQL injection -- candidate (insert)")
                 cursor.execute(query)
@@ -105,6 +171,98 @@ class mysql_db_class():
 
         return success
 
+    @contextlib.contextmanager
+    def batch_connection(self):
+        """ cursor for insert_batches (closed on exit) """
+        cursor = self.connection.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def execute_batch(self, cursor, query, batch):
+        cursor.executemany(query, batch)
+
+    def commit_batch(self, cursor):
+        self.connection.commit()
+
+    def rollback_batch(self, cursor):
+        self.connection.rollback()
+
+    def staged_update(self, queries, vals, batch_size=1000):
+        """ Set based update -- queries = (create, insert, update, drop): creates staging
+            (temporary) table, streams rows via executemany & runs single UPDATE ... JOIN in
+            one transaction, returns 0 in case of success else 1
+        """
+        success = 1
+        create, insert, update, drop = queries
+
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(drop)
+            cursor.execute(create)
+
+            itr = iter(vals)
+            batch = list(it.islice(itr, batch_size))
+            while batch:
+                cursor.executemany(insert, batch)
+                batch = list(it.islice(itr, batch_size))
+
+            cursor.execute(update)
+            self.connection.commit()
+            success = 0
+        except mysqldb.Error as err:
+            print("Failed Update: {}".format(err))
+            self.connection.rollback()
+        finally:
+            try:
+                cursor.execute(drop)
+            except mysqldb.Error as err:
+                print("Failed Drop: {}".format(err))
+            cursor.close()
+
+        return success
+
+    def load_data_local(self, query, vals, tmp_dir=None):
+        """ Bulk load -- writes rows (iterable of tuples, None => NULL) to temporary csv and
+            executes query (LOAD DATA LOCAL INFILE %s ...) against it, returns 0 in case of
+            success else 1 (requires local_infile=True) -- LOCAL loads turn duplicate key /
+            conversion errors into warnings & skip rows, hence the load is rolled back unless
+            all rows were loaded without warnings
+        """
+        success = 1
+        cursor = None
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as directory:
+            filename = os.path.join(directory, "load_data.csv")
+            try:
+                rows = 0
+                with open(filename, "w", newline="") as fp:
+                    writer = csv.writer(fp, lineterminator="\n")
+                    for row in vals:
+                        writer.writerow(["\\N" if val is None else val for val in row])
+                        rows += 1
+
+                cursor = self.connection.cursor()
+                cursor.execute(query, (filename,))
+                loaded = cursor.rowcount
+                cursor.execute("SHOW WARNINGS")
+                warnings = cursor.fetchall()
+                if loaded != rows or warnings:
+                    print("Failed Load: %d of %d rows loaded, warnings %s" % (
+                        loaded, rows, warnings[:3]))
+                    self.connection.rollback()
+                else:
+                    self.connection.commit()
+                    success = 0
+            except mysqldb.Error as err:
+                print("Failed Load: {}".format(err))
+                self.connection.rollback()
+            finally:
+                if cursor is not None:
+                    cursor.close()
+
+        return success
+
     def update(self, query, params_tuple=None):
         """ Simple update query -- with roll back in case of failure"""
         success = 1
@@ -132,7 +290,7 @@ class mysql_db_class():
     def query(self, query, params_tuple=None):
         """ Select query fetch -- applies MySQLCursorDict to cursor"""
 
-        cursor = self.connection.cursor(dictionary=True)
+        cursor = self.get_dict_cursor()
         if isinstance(query, str) and params_tuple is None:
             # print("Warning -- SQL injection -- candidate (query)")
             cursor.execute(query)
@@ -147,6 +305,48 @@ class mysql_db_class():
 
         return cursor.fetchall()
 
+    def query_iter(self, query, params_tuple=None, chunk_size=10000, index_col=None):
+        """ Select query streamed through unbuffered (tuple) cursor -- yields pd.DataFrame
+            chunks of at most chunk_size rows (columns built from fetchmany tuples), index_col
+            & date columns parsed (sbc.convert_date_columns)
+        """
+        cursor = self.connection.cursor(buffered=False)
+        try:
+            if params_tuple is None:
+                cursor.execute(query)
+            else:
+                cursor.execute(query, params_tuple)
+
+            names = list(cursor.column_names)
+            rows = cursor.fetchmany(chunk_size)
+            while rows:
+                df = pd.DataFrame.from_records(rows, columns=names, coerce_float=True)
+                yield sbc.convert_date_columns(df, index_col)
+                rows = cursor.fetchmany(chunk_size)
+        finally:
+            cursor.close()
+
+    def calc_watermark(self, table, index_name):
+        """ returns MAX(index_name) of table (resolved via index on index_name) """
+        res = self.query(sbc.sql_query_base({"table": table, "index_name": index_name})
+                         .calc_max_query())
+        return res[0]['watermark'] if res else None
+
+    def calc_has_unique_key(self, table, index_name):
+        """ True if index_name alone is primary / unique key of table -- required by
+            ON DUPLICATE KEY UPDATE (upsert)
+        """
+        try:
+            rows = self.query("SHOW INDEX FROM " + table + " WHERE Non_unique = 0")
+        except mysqldb.Error as err:
+            print("Failed Key Check: {}".format(err))
+            return False
+
+        keys = {}
+        for row in sorted(rows, key=lambda itm: itm["Seq_in_index"]):
+            keys.setdefault(row["Key_name"], []).append(row["Column_name"])
+        return [index_name] in keys.values()
+
     def execute_stored_procedure(self, sp_name, sp_args_list):
         """ Call stored procedure from mysql"""
         success = 1
@@ -183,5 +383,4 @@ class mysql_db_class():
 
 
     def __del__(self):
-        if self.connection:
-            self.connection.close()
+        self.close()
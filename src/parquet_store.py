@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+""" Partitioned (by year) Parquet / Arrow store of table extracts """
+import os
+import re
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+PARTITION = re.compile(r"^year=(\d+)$")
+
+
+def check_pyarrow():
+    """ raises ValueError if pyarrow is not available """
+    if pa is None:
+        raise ValueError("parquet_store requires pyarrow")
+
+
+def calc_years(directory):
+    """ returns sorted years (int) partitioned in directory """
+    if not os.path.isdir(directory):
+        return []
+    return sorted([int(PARTITION.match(itm).group(1)) for itm in os.listdir(directory)
+                   if PARTITION.match(itm)])
+
+
+def calc_partition_files(directory, years=None):
+    """ returns part files (year order, then part order) of directory (years: subset) """
+    files = []
+    for year in calc_years(directory):
+        if years is not None and year not in years:
+            continue
+        path = os.path.join(directory, "year=%d" % (year))
+        files.extend([os.path.join(path, itm) for itm in sorted(os.listdir(path))
+                      if itm.startswith("part-") and
+                      os.path.splitext(itm)[1] in FORMATS.values()])
+    return files
+
+
+def normalize_frame(df, index_name):
+    """ coerces chunk to stable schema -- index_name => datetime64, object columns of
+        numbers / NULLs => float64
+    """
+    df = df.reset_index(drop=True)
+    df[index_name] = pd.to_datetime(df[index_name])
+    for key in df.columns:
+        if key != index_name and df[key].dtype == object:
+            try:
+                df[key] = df[key].astype(np.float64)
+            except (TypeError, ValueError):
+                continue
+    return df
+
+
+def write_partitions(chunks, directory, index_name, fmt="parquet"):
+    """ writes DataFrame chunks (e.g. streamed query_iter) into directory/year=YYYY/part-N
+        files (existing part files are replaced), returns {year: rows}
+    """
+    check_pyarrow()
+    if fmt not in FORMATS.keys():
+        raise ValueError("Unknown format %s" % (fmt))
+
+    for path in calc_partition_files(directory):
+        os.remove(path)
+
+    counts = {}
+    for seq, chunk in enumerate(chunks):
+        df = normalize_frame(chunk, index_name)
+        years = df[index_name].dt.year.to_numpy()
+        for year in np.unique(years):
+            path = os.path.join(directory, "year=%d" % (year))
+            os.makedirs(path, exist_ok=True)
+
+            table = pa.Table.from_pandas(df[years == year], preserve_index=False)
+            filename = os.path.join(path, "part-%05d%s" % (seq, FORMATS[fmt]))
+            if fmt == "parquet":
+                pq.write_table(table, filename)
+            else:
+                with pa.OSFile(filename, "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+
+            counts[int(year)] = counts.get(int(year), 0) + table.num_rows
+    return counts
+
+
+def read_table(filename, columns=None):
+    """ reads single part file -- arrow files are memory mapped (zero copy) """
+    if filename.endswith(FORMATS["arrow"]):
+        table = pa.ipc.open_file(pa.memory_map(filename, "r")).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(filename, columns=columns, memory_map=True)
+
+
+def read_partitions(directory, years=None, columns=None, index_name=None):
+    """ reads (years of) store into single DataFrame -- index_name (if specified) is used
+        as index
+    """
+    check_pyarrow()
+    files = calc_partition_files(directory, years)
+    if not files:
+        return pd.DataFrame()
+
+    if columns is not None and index_name is not None and index_name not in columns:
+        columns = [index_name] + list(columns)
+
+    df = pa.concat_tables([read_table(itm, columns) for itm in files]).to_pandas()
+    if index_name is not None:
+        df = df.set_index(index_name)
+    return df
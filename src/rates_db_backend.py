@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+""" Backend protocol implemented by mysql_db_class & sqlalchemy_db_class (see
+    base_interest_rates_interface.connect_backend) & logic shared by both backends
+"""
+import itertools as it
+import typing
+import pandas as pd
+import sql_class_base as sbc
+
+
+@typing.runtime_checkable
+class rates_db_backend(typing.Protocol):
+    """ Database backend used by rates interfaces -- queries use mysql %s / %(name)s
+        parameter markers, writes return 0 in case of success else 1
+    """
+    dialect: str
+
+    def insert(self, query, params_tuple=None):
+        """ literal (or parameterized) insert """
+        ...
+
+    def insert_batches(self, query, vals, batch_size=1000, commit_per_batch=False):
+        """ executemany of rows (tuples / dicts) in batches of batch_size """
+        ...
+
+    def upsert(self, table, index_name, names, vals, overwrite=False, batch_size=1000):
+        """ batched upsert of rows (index, val_1, ..., val_n) -- fills NULL cells or if
+            overwrite writes non NULL values
+        """
+        ...
+
+    def update(self, query, params_tuple=None):
+        """ update w/ single or list of parameter rows """
+        ...
+
+    def query(self, query, params_tuple=None):
+        """ returns rows as list of dicts """
+        ...
+
+    def query_iter(self, query, params_tuple=None, chunk_size=10000, index_col=None):
+        """ yields pd.DataFrame chunks -- index_col & date columns parsed (datetime64) """
+        ...
+
+    def query_frame(self, query, params_tuple=None, chunk_size=10000, index_col=None):
+        """ returns pd.DataFrame -- index_col & date columns parsed (datetime64) """
+        ...
+
+    def calc_watermark(self, table, index_name):
+        """ returns MAX(index_name) of table """
+        ...
+
+    def calc_has_unique_key(self, table, index_name):
+        """ True if index_name alone is primary / unique key of table (upsert target) """
+        ...
+
+    def execute_stored_procedure(self, sp_name, sp_args_list):
+        """ calls stored procedure (no result) """
+        ...
+
+    def execute_stored_procedure_result(self, sp_name, sp_args_list):
+        """ calls stored procedure, returns rows as list of dicts """
+        ...
+
+    def close(self):
+        """ releases connection (returned to pool if pooled) """
+        ...
+
+
+class rates_db_backend_base():
+    """ Batching, upsert & frame fetch shared by backends -- backends supply driver calls
+        batch_connection (context manager), execute_batch, commit_batch, rollback_batch,
+        driver_error & query_iter
+    """
+    dialect = "mysql"
+    driver_error = Exception
+
+    def insert_batches(self, query, vals, batch_size=1000, commit_per_batch=False):
+        """ Streams rows (any iterable of tuples / dicts) through executemany in batches of
+            batch_size (mysql %s / %(name)s markers) -- commits per batch or once at the
+            end, returns 0 in case of success else 1
+        """
+        success = 1
+        if not isinstance(query, str) or batch_size < 1:
+            raise ValueError("insert_batches requires str query && positive batch_size")
+
+        with self.batch_connection() as handle:
+            try:
+                itr = iter(vals)
+                batch = list(it.islice(itr, batch_size))
+                while batch:
+                    self.execute_batch(handle, query, batch)
+                    if commit_per_batch:
+                        self.commit_batch(handle)
+                    batch = list(it.islice(itr, batch_size))
+
+                self.commit_batch(handle)
+                success = 0
+            except self.driver_error as err:
+                print("Failed Insert: {}".format(err))
+                self.rollback_batch(handle)
+
+        return success
+
+    def upsert(self, table, index_name, names, vals, overwrite=False, batch_size=1000):
+        """ Batched upsert of rows (index, val_1, ..., val_n) -- fills NULL cells or if
+            overwrite writes non NULL values (sql_query_base.calc_upsert_query), returns 0
+            in case of success else 1
+        """
+        upsert_query = sbc.sql_query_base({"table": table, "index_name": index_name})
+        return self.insert_batches(
+            upsert_query.calc_upsert_query(names, overwrite=overwrite, dialect=self.dialect),
+            vals, batch_size=batch_size, commit_per_batch=False)
+
+    def query_frame(self, query, params_tuple=None, chunk_size=10000, index_col=None):
+        """ Select query fetch as single pd.DataFrame (see query_iter), index_col (if
+            specified) is used as index & retained as column, index_col & date columns
+            parsed into datetime64
+        """
+        chunks = list(self.query_iter(query, params_tuple, chunk_size=chunk_size,
+                                      index_col=index_col))
+        if not chunks:
+            return pd.DataFrame()
+
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+        if index_col is not None:
+            df.index = df[index_col]
+        return df
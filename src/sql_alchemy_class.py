@@ -1,15 +1,31 @@
 """ Class wrapper around the python interface to mysql database """
 #!/usr/bin/python3
 # import MySQLdb as mysqldb
+import datetime as dt
+import re
 import sys
+import threading
+import numpy as np
 import pandas as pd
 import sqlalchemy as sa 
 from sqlalchemy import create_engine
 from sqlalchemy import inspect
+import rates_db_backend as rdb
+import sql_class_base as sbc
 
+# reflected schema (sa.MetaData w/ lazily autoloaded Tables) per engine url
+SCHEMAS = {}
+SCHEMAS_LOCK = threading.Lock()
 
-class sqlalchemy_db_class():
+# connection settings applied during sqlite bulk loads
+SQLITE_BULK_PRAGMAS = ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL",
+                       "PRAGMA cache_size=-262144"]
+PARAM_MARKERS = {"qmark": "?", "numeric": "?", "format": "%s", "pyformat": "%s"}
+
+
+class sqlalchemy_db_class(rdb.rates_db_backend_base):
     """ Simple class wrapping access to mysql database """
+    driver_error = sa.exc.SQLAlchemyError
 
     def __init__(self, path="/home/spennington/data/init_db.db", group="remote", password=None,
                  host=None, user="spennington", db="jobsearch", dbg=False):
@@ -20,6 +36,8 @@ class sqlalchemy_db_class():
         self.database = db
         self.port = 3306
         self.dbg = dbg
+        self.dialect = None
+        self.procedures = {}
 
         if password and host:
             if self.dbg:
@@ -41,6 +59,7 @@ class sqlalchemy_db_class():
                 self.engine = create_engine(dbi_uri)
 
                 if self.engine and isinstance(self.engine, sa.engine.base.Engine):
+                    self.dialect = self.engine.dialect.name
                     if self.dbg:
                         inspector = inspect(self.engine)
                         print(inspector.get_table_names())
@@ -55,33 +74,70 @@ class sqlalchemy_db_class():
             # conf['password'] = conf['password'].replace("\"", '')
             # conf['password'] = conf['password'].encode(encoding='utf-8')
 
+    def get_table(self, name):
+        """ returns sa.Table -- reflected once per engine (url) & table, then cached """
+        key = str(self.engine.url)
+        with SCHEMAS_LOCK:
+            if key not in SCHEMAS.keys():
+                SCHEMAS[key] = sa.MetaData()
+            meta = SCHEMAS[key]
+
+            if name not in meta.tables.keys():
+                sa.Table(name, meta, autoload_with=self.engine)
+            return meta.tables[name]
+
+    def refresh_schema(self, name=None):
+        """ drops cached reflection of table name (all tables of engine if None) -- required
+            after DDL changes
+        """
+        key = str(self.engine.url)
+        with SCHEMAS_LOCK:
+            if key not in SCHEMAS.keys():
+                return
+            if name is None:
+                SCHEMAS.pop(key)
+            elif name in SCHEMAS[key].tables.keys():
+                SCHEMAS[key].remove(SCHEMAS[key].tables[name])
+
     def insert(self, data, params_tuple=None):
         """ Simple insert query -- with roll back in case of failure , returns 1
-            Note to write multiple instancas pass a pd.DataFrame
+            Note to write multiple instancas pass a pd.DataFrame (params_tuple bulk: True
+            => insert_bulk, chunk_size rows per executemany, index_name column of df.index)
             in case of success 0
             EX:         "INSERT INTO securities (cusip, BBG_Name, tranche, vintage, classification)
             EX (cont.):      VALUES ();
         """
+        if isinstance(data, pd.DataFrame) and data.shape[0] > 0 and\
+                params_tuple and isinstance(params_tuple, dict) and\
+                "bulk" in params_tuple.keys() and params_tuple["bulk"]:
+            try:
+                return self.insert_bulk(
+                    data, params_tuple['table'],
+                    chunk_size=(int(params_tuple["chunk_size"])
+                                if "chunk_size" in params_tuple.keys() else 100000),
+                    index_name=(params_tuple["index_name"]
+                                if "index_name" in params_tuple.keys() else None))
+            except ValueError as v:
+                print("Failed Insert {}".format(v))
+                return 1
+
         success = 1
         with self.engine.connect() as conn:
             with conn.begin() as trans:
                 try:
                     result = None
-                    meta = sa.MetaData(self.engine)
 
                     if isinstance(data, str) and params_tuple is None:
                         print("Warning -- SQL injection -- candidate (insert)")
-                        result = self.engine.execute(data)
+                        result = conn.execute(sa.text(data))
                     elif isinstance(data, pd.DataFrame) and data.shape[0] > 0 and\
                             params_tuple and isinstance(params_tuple, dict):
-                        table = sa.Table(params_tuple['table'], meta, autoload=True,
-                                         autoload_with=self.engine)
+                        table = self.get_table(params_tuple['table'])
                         result = conn.execute(table.insert(), data.to_dict(orient='records'))
                         # print("DF " + str(result))        
                     elif isinstance(data, pd.Series) and\
                             params_tuple and isinstance(params_tuple, dict):
-                        table = sa.Table(params_tuple['table'], meta, autoload=True,
-                                         autoload_with=self.engine)
+                        table = self.get_table(params_tuple['table'])
                         vals = data.to_dict()
                         # ins = table.insert(values=vals)
                         result = conn.execute(table.insert(), vals)
@@ -112,49 +168,95 @@ class sqlalchemy_db_class():
                     conn.close()
         return success
 
-    def update(self, query, params_tuple=None):
-        """ Simple update query -- with roll back in case of failure"""
+    def insert_bulk(self, df, name, chunk_size=100000, index_name=None):
+        """ Bulk insert of df (single transaction) -- column ordered tuples (table columns
+            found in df, df.index as index_name column, default df.index.name) passed to
+            DBAPI executemany chunk_size rows at a time, sqlite: SQLITE_BULK_PRAGMAS applied
+            for the load only (prior settings restored), returns 0 on success -- raises
+            ValueError if primary key columns or (non range) df.index are not mapped
+        """
+        index_name = df.index.name if index_name is None else index_name
+        table = self.get_table(name)
+        names = [col.name for col in table.columns
+                 if col.name in df.columns or col.name == index_name]
+        if not names:
+            raise ValueError("No columns of DataFrame found in " + name)
+
+        missing = [col.name for col in table.primary_key.columns if col.name not in names]
+        if missing:
+            raise ValueError("Key column(s) %s of %s not found in DataFrame (index_name)" % (
+                missing, name))
+        if index_name not in names and not isinstance(df.index, pd.RangeIndex):
+            raise ValueError("DataFrame index not mapped to column of %s (index_name)" % (
+                name))
+
+        marker = PARAM_MARKERS[self.engine.dialect.paramstyle]
+        q_str = "".join(["INSERT INTO ", name, " (", ", ".join(names), ") VALUES (",
+                         ", ".join([marker]*len(names)), ")"])
+
         success = 1
-        try:
-            if isinstance(query, str) and params_tuple is None:
-                print("Warning -- SQL injection -- candidate (update)")
-                self.cursor.execute(query)
-            elif isinstance(query, tuple) and isinstance(params_tuple, (tuple, dict)):
-                self.cursor.execute(query, params_tuple)
-            elif isinstance(query, str) and isinstance(params_tuple, (tuple, dict)):
-                self.cursor.execute(query, params_tuple)
-            else:
-                raise ValueError("SQL (query) type combination not supported")
-
-            self.connection.commit()
-            success = 0
-        except ValueError as v:
-            print("Failed Insert {}".format(v))
-        except sa.exc.SQLAlchemyError as err:
-            print("Failed Insert: {}".format(err))
-            self.connection.rollback()
+        with self.engine.connect() as conn:
+            prior = (self.apply_pragmas(conn, SQLITE_BULK_PRAGMAS)
+                     if self.dialect == "sqlite" else [])
+            try:
+                with conn.begin():
+                    for start in range(0, df.shape[0], chunk_size):
+                        chunk = df.iloc[start:(start + chunk_size)]
+                        cols = [calc_param_column(chunk.index if key == index_name and
+                                                  key not in df.columns else chunk[key])
+                                for key in names]
+                        conn.exec_driver_sql(q_str, list(zip(*cols)))
+                success = 0
+            except sa.exc.SQLAlchemyError as err:
+                print("Failed Insert {}".format(err))
+            finally:
+                try:
+                    self.apply_pragmas(conn, prior)
+                except sa.exc.SQLAlchemyError as err:
+                    # connection (& its settings) discarded, journal_mode persists in file
+                    print("Failed to restore pragmas {}".format(err))
+                    conn.invalidate()
 
         return success
 
+    @staticmethod
+    def apply_pragmas(conn, pragmas):
+        """ Applies PRAGMA name=value statements (outside of transaction), returns the
+            statements restoring prior values
+        """
+        prior = []
+        for pragma in pragmas:
+            name = pragma.split()[1].split("=")[0]
+            value = conn.exec_driver_sql("PRAGMA " + name).scalar()
+            prior.insert(0, "PRAGMA %s=%s" % (name, value))
+            conn.exec_driver_sql(pragma)
+        conn.commit()
+        return prior
+
     def query(self, query, params_tuple=None):
-        """ Select query fetch -- applies MySQLCursorDict to cursor"""
+        """ Select query fetch -- returns list of dicts """
 
         result = None
         with self.engine.connect() as conn:
             try:
                 result = None
-                meta = sa.MetaData(self.engine).reflect()
 
                 if query and isinstance(query, str) and params_tuple is None:
-                    print("Warning -- SQL injection -- candidate (insert)")
-                    result = self.engine.execute(query)
+                    # print("Warning -- SQL injection -- candidate (query)")
+                    result = [dict(row) for row in conn.execute(sa.text(query)).mappings()]
+
+                elif query and isinstance(query, str) and\
+                        isinstance(params_tuple, (tuple, dict, list)):
+                    result = conn.exec_driver_sql(
+                        self.calc_driver_query(query), calc_driver_params(params_tuple))
+                    result = [dict(row) for row in result.mappings()]
 
                 elif query is None and isinstance(params_tuple, dict) and\
                         'table' in params_tuple.keys() and len(params_tuple) == 1:
-                    table = meta.tables[params_tuple['table']]
+                    table = self.get_table(params_tuple['table'])
 
-                    select_str = sa.select([table])
-                    result = self.engine.execute(select_str) 
+                    select_str = sa.select(table)
+                    result = [dict(row) for row in conn.execute(select_str).mappings()]
                 else:
                     raise ValueError("SQL (query) type combination not supported")
 
@@ -176,41 +278,200 @@ class sqlalchemy_db_class():
                 conn.close()
         return result 
 
+    def query_iter(self, query, params_tuple=None, chunk_size=10000, index_col=None):
+        """ Select query streamed (stream_results) -- yields pd.DataFrame chunks of at most
+            chunk_size rows, index_col & date (TEXT) columns parsed (sbc.convert_date_columns)
+        """
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).exec_driver_sql(
+                self.calc_driver_query(query),
+                calc_driver_params(params_tuple) if params_tuple is not None else ())
+
+            names = list(result.keys())
+            rows = result.fetchmany(chunk_size)
+            while rows:
+                df = pd.DataFrame.from_records([tuple(row) for row in rows], columns=names,
+                                               coerce_float=True)
+                yield sbc.convert_date_columns(df, index_col)
+                rows = result.fetchmany(chunk_size)
+
+    def calc_watermark(self, table, index_name):
+        """ returns MAX(index_name) of table -- %Y-%m-%d text converted to dt.date """
+        with self.engine.connect() as conn:
+            res = conn.exec_driver_sql(sbc.sql_query_base(
+                {"table": table, "index_name": index_name}).calc_max_query()).scalar()
+
+        if isinstance(res, str):
+            res = pd.Timestamp(res).date()
+        return res
+
+    def calc_has_unique_key(self, table, index_name):
+        """ True if index_name alone is primary / unique key of table -- required by
+            ON CONFLICT (index_name) DO UPDATE (upsert)
+        """
+        try:
+            inspector = inspect(self.engine)
+            keys = [inspector.get_pk_constraint(table)["constrained_columns"]]
+            keys += [itm["column_names"] for itm in inspector.get_unique_constraints(table)]
+            keys += [itm["column_names"] for itm in inspector.get_indexes(table)
+                     if itm["unique"]]
+        except sa.exc.SQLAlchemyError as err:
+            print("Failed Key Check: {}".format(err))
+            return False
+        return [index_name] in keys
+
+    def calc_driver_query(self, query):
+        """ translates (mysql) %s / %(name)s parameter markers into DBAPI paramstyle """
+        paramstyle = self.engine.dialect.paramstyle
+        if paramstyle in ("qmark", "numeric"):
+            query = re.sub(r"%\((\w+)\)s", r":\1", query).replace("%s", "?")
+        elif paramstyle == "named":
+            query = re.sub(r"%\((\w+)\)s", r":\1", query)
+        return query
+
+    def batch_connection(self):
+        """ connection for insert_batches (closed on exit) """
+        return self.engine.connect()
+
+    def execute_batch(self, conn, query, batch):
+        conn.exec_driver_sql(self.calc_driver_query(query), calc_driver_params(batch))
+
+    def commit_batch(self, conn):
+        conn.commit()
+
+    def rollback_batch(self, conn):
+        conn.rollback()
+
+    def update(self, query, params_tuple=None):
+        """ Simple update query -- with roll back in case of failure, params_tuple may be
+            list of tuples / dicts (executemany, single transaction), returns 0 in case of
+            success else 1
+        """
+        success = 1
+        try:
+            with self.engine.begin() as conn:
+                if isinstance(query, str) and params_tuple is None:
+                    print("Warning -- SQL injection -- candidate (update)")
+                    conn.exec_driver_sql(query)
+                elif isinstance(query, str) and isinstance(params_tuple, (tuple, dict)):
+                    conn.exec_driver_sql(self.calc_driver_query(query),
+                                         calc_driver_params(params_tuple))
+                elif isinstance(query, str) and isinstance(params_tuple, list):
+                    if params_tuple:
+                        conn.exec_driver_sql(self.calc_driver_query(query),
+                                             calc_driver_params(params_tuple))
+                else:
+                    raise ValueError("SQL (query) type combination not supported")
+
+            success = 0
+        except ValueError as v:
+            print("Failed Update {}".format(v))
+        except sa.exc.SQLAlchemyError as err:
+            print("Failed Update: {}".format(err))
+
+        return success
+
+    def register_procedure(self, sp_name, procedure):
+        """ registers stored procedure emulation -- procedure: callable(conn, *args)
+            returning rows (or None), SELECT statement (args as parameters) or view name
+        """
+        if not callable(procedure) and not isinstance(procedure, str):
+            raise ValueError("procedure must be callable or str (SELECT / view)")
+        self.procedures[sp_name] = procedure
+
+    def register_procedures(self, procedures):
+        """ registers procedure emulations {sp_name: SELECT statement / view name} (options
+            procedures)
+        """
+        for sp_name, procedure in procedures.items():
+            self.register_procedure(sp_name, procedure)
+
+    def check_procedure(self, sp_name):
+        """ raises ValueError if sp_name has no registered emulation """
+        if sp_name not in self.procedures.keys():
+            raise ValueError("Stored procedure %s is not registered (options procedures: "
+                             "{sp_name: SELECT / view})" % (sp_name))
+
+    def call_procedure(self, conn, sp_name, sp_args_list):
+        """ executes registered procedure on conn -- returns list of dicts or None """
+        self.check_procedure(sp_name)
+
+        procedure = self.procedures[sp_name]
+        if callable(procedure):
+            return procedure(conn, *(sp_args_list if sp_args_list else []))
+
+        if procedure.strip().upper().startswith("SELECT"):
+            result = conn.exec_driver_sql(self.calc_driver_query(procedure),
+                                          tuple(sp_args_list if sp_args_list else []))
+        else:
+            result = conn.execute(sa.select(self.get_table(procedure)))
+        return [dict(row) for row in result.mappings()]
+
     def execute_stored_procedure(self, sp_name, sp_args_list):
-        """ Call stored procedure from mysql"""
+        """ Call (emulated) stored procedure -- single transaction, unregistered sp_name
+            raises ValueError
+        """
+        self.check_procedure(sp_name)
         success = 1
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.callproc(sp_name, sp_args_list)
-            self.connection.commit()
-            cursor.close()
+            with self.engine.begin() as conn:
+                self.call_procedure(conn, sp_name, sp_args_list)
             success = 0
+        except ValueError as v:
+            print("Failed to exceute stored procedure {}".format(v))
         except sa.exc.SQLAlchemyError as err:
             print("Failed to exceute stored procedure: {}".format(err))
-            self.connection.rollback()
 
         return success
 
     def execute_stored_procedure_result(self, sp_name, sp_args_list):
-        """ Call stored procedure from mysql"""
-        success = 1
+        """ Call (emulated) stored procedure -- returns rows (list of dicts) or None on
+            failure, unregistered sp_name raises ValueError
+        """
+        self.check_procedure(sp_name)
+        result = None
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            success = cursor.callproc(sp_name, sp_args_list)
-
-            # print(cursor.column_names) -- columns name not useful
-            for result in cursor.stored_results():
-                success = result.fetchall()
-            # print(success)
-            # self.connection.commit()
-            cursor.close()
+            with self.engine.connect() as conn:
+                result = self.call_procedure(conn, sp_name, sp_args_list)
         except sa.exc.SQLAlchemyError as err:
             print("Failed to exceute stored procedure: {}".format(err))
-            self.connection.rollback()
 
-        return success
+        return result
 
+    def close(self):
+        """ Releases pooled engine connections """
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+        if self.engine is not None:
+            self.engine.dispose()
 
     def __del__(self):
         if self.connection:
             self.connection.close()
+
+
+def calc_param_column(vals):
+    """ converts column (pd.Series / Index) into DBAPI parameter list -- dates => %Y-%m-%d
+        str, NaN => None
+    """
+    if pd.api.types.is_datetime64_any_dtype(vals.dtype):
+        return sbc.convert_timestamps(vals)
+
+    arr = vals.to_numpy()
+    if np.issubdtype(arr.dtype, np.floating):
+        res = arr.astype(object)
+        res[np.isnan(arr)] = None
+        return res.tolist()
+    return arr.tolist()
+
+
+def calc_driver_params(params):
+    """ DBAPI parameters -- list (executemany) of tuples / dicts, dates => %Y-%m-%d str """
+    if isinstance(params, list):
+        return [calc_driver_params(itm) for itm in params]
+    if isinstance(params, dict):
+        return {key: (val.strftime("%Y-%m-%d") if isinstance(val, dt.date) else val)
+                for key, val in params.items()}
+    return tuple([val.strftime("%Y-%m-%d") if isinstance(val, dt.date) else val
+                  for val in params])
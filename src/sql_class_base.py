@@ -2,11 +2,16 @@
 #!/usr/bin/python3
 import collections as co
 import datetime as dt
+import functools as ft
+import re
 from enum import Enum, unique
 import numpy as np
 import pandas as pd
 import debug_control as dbc
 
+# %Y-%m-%d (optionally w/ time) text -- dates stored as TEXT (sqlite)
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$")
+
 @unique
 class sql_type(Enum):
     """ Enumerations determining type of SQL action """
@@ -23,6 +28,7 @@ class sql_query_base():
     def __init__(self, info, table=None, q_str="SELECT"):
         """ sql_query_base cobnstructor: requires table or table or infor["table"] """
         self.columns = None
+        self.row_format = None
         if table is not None:
             self.table = table
         elif info is not None and isinstance(info, dict) and\
@@ -61,8 +67,8 @@ class sql_query_base():
         self.return_result = False
         self.q_str = "generate"
 
-        if  "items" in info.keys() and len(info["items"]) == 1 and\
-                "columns" in info.keys() and isinstance(info["columns"], dict):
+        # vertical table -- columns specify layout regardless of number of items
+        if "columns" in info.keys() and isinstance(info["columns"], dict):
             self.columns = co.OrderedDict()
             for key, val in info["columns"].items():
                 self.columns[key] = val
@@ -154,30 +160,124 @@ class sql_query_base():
 
         self.q_str = "".join(["INSERT INTO ", self.table, final])
 
+    def calc_column_names(self, excludes=None):
+        """ returns chosen (insert) column names -- self.columns keys less excludes """
+        q_temp = []
+        if excludes and isinstance(excludes, str):
+            for key in self.columns.keys():
+                if key != excludes:
+                    q_temp.append(key)
+        elif excludes and isinstance(excludes, list):
+            for key in self.columns.keys():
+                if key not in excludes:
+                    q_temp.append(key)
+        elif excludes is None:
+            for key in self.columns.keys():
+                q_temp.append(key)
+        else:
+            raise ValueError("append_names accepts lists, dict keys and pd.DataFrame indexes")
+        return q_temp
+
     def append_names(self, excludes=None, append=", "):
         """ appends names + returns chosen columns """
 
         if self.columns and self.q_str.startswith("INSERT"):
-            q_temp = []
-            if excludes and isinstance(excludes, str):
-                for key in self.columns.keys():
-                    if key != excludes:
-                        q_temp.append(key)
-            elif excludes and isinstance(excludes, list):
-                for key in self.columns.keys():
-                    if key not in excludes:
-                        q_temp.append(key)
-            elif excludes is None:
-                for key in self.columns.keys():
-                    q_temp.append(key)
-            else:
-                raise ValueError("append_names accepts lists, dict keys and pd.DataFrame indexes")
+            q_temp = self.calc_column_names(excludes)
         else:
             raise ValueError("append_names does not accept NULL init_objections")
 
-        q_temp = ", ".join(q_temp)
-        self.q_str = append.join([self.q_str, q_temp])
+        self.q_str = append.join([self.q_str, ", ".join(q_temp)])
         self.q_str = "".join([self.q_str, ") VALUES "])
+        return q_temp
+
+    def construct_insert_template(self, excludes=None):
+        """ builds parameterized INSERT INTO table (index, cols...) VALUES (%s, ...) used w/
+            executemany (rows from append_params_frame)
+        """
+        self.construct_insert_start(include_index=True)
+        names = self.append_names(excludes=excludes, append="")
+        idx_cnt = len(self.index_name) if isinstance(self.index_name, list) else 1
+
+        self.q_str = "".join([self.q_str, "(", ", ".join(["%s"]*(idx_cnt + len(names))), ")"])
+
+    def calc_upsert_query(self, names, overwrite=False, dialect="mysql"):
+        """ returns INSERT (index, names) VALUES (%s, ...) ON DUPLICATE KEY UPDATE
+            name = COALESCE(name, VALUES(name)) -- fills NULL cells only, overwrite:
+            name = COALESCE(VALUES(name), name) -- writes all non NULL values
+            (dialect sqlite: ON CONFLICT (index) DO UPDATE SET ... excluded.name) -- requires
+            primary / unique key on index_name alone, otherwise rows are appended
+            (mysql) or the statement fails (sqlite)
+        """
+        if dialect == "sqlite":
+            new, old = ["excluded." + key for key in names], [self.table + "." + key
+                                                              for key in names]
+            conflict = "".join([") ON CONFLICT (", self.index_name, ") DO UPDATE SET "])
+        else:
+            new, old = ["VALUES(" + key + ")" for key in names], names
+            conflict = ") ON DUPLICATE KEY UPDATE "
+
+        pairs = zip(new, old) if overwrite else zip(old, new)
+        upd = ", ".join(["".join([key, " = COALESCE(", first, ", ", second, ")"])
+                         for key, (first, second) in zip(names, pairs)])
+        return "".join(["INSERT INTO ", self.table, " (", ", ".join([self.index_name] + names),
+                        ") VALUES (", ", ".join(["%s"]*(len(names) + 1)), conflict, upd])
+
+    def calc_staging_queries(self, names, stage):
+        """ returns (create, insert, update, drop) statements of staged (temporary table)
+            UPDATE ... JOIN -- fills NULL cells only
+        """
+        cols = ", ".join([self.index_name] + names)
+        create = "".join(["CREATE TEMPORARY TABLE ", stage, " AS SELECT ", cols, " FROM ",
+                          self.table, " LIMIT 0"])
+        insert = "".join(["INSERT INTO ", stage, " (", cols, ") VALUES (",
+                          ", ".join(["%s"]*(len(names) + 1)), ")"])
+        update = "".join(["UPDATE ", self.table, " t JOIN ", stage, " s ON t.", self.index_name,
+                          " = s.", self.index_name, " SET ",
+                          ", ".join(["".join(["t.", key, " = COALESCE(t.", key, ", s.", key, ")"])
+                                     for key in names])])
+        drop = "".join(["DROP TEMPORARY TABLE IF EXISTS ", stage])
+        return create, insert, update, drop
+
+    def calc_window_query(self, names):
+        """ returns SELECT index, names ... WHERE index BETWEEN %s AND %s -- current values
+            of date window
+        """
+        return "".join(["SELECT ", ", ".join([self.index_name] + names), " FROM ", self.table,
+                        " WHERE ", self.index_name, " >= %s AND ", self.index_name,
+                        " <= %s ORDER BY ", self.index_name, ";"])
+
+    def calc_max_query(self):
+        """ returns SELECT MAX(index) AS watermark -- resolved via index on index_name """
+        index_name = self.index_name[0] if isinstance(self.index_name, list) else self.index_name
+        return "".join(["SELECT MAX(", index_name, ") AS watermark FROM ", self.table, ";"])
+
+    def calc_watermark_query(self, id_name=None, date_name=None):
+        """ returns per series high-water mark query -- vertical tables (id_name):
+            SELECT id, MAX(date) ... GROUP BY id, otherwise single row of
+            MAX(CASE WHEN col IS NOT NULL THEN index END) per column
+        """
+        date_name = self.index_name if date_name is None else date_name
+        if id_name:
+            return "".join(["SELECT ", id_name, " AS series, MAX(", date_name,
+                             ") AS watermark FROM ", self.table, " GROUP BY ", id_name, ";"])
+
+        cases = ["".join(["MAX(CASE WHEN ", key, " IS NOT NULL THEN ", date_name, " END) AS ",
+                          key]) for key in self.calc_column_names(excludes=date_name)]
+        return "".join(["SELECT ", ", ".join(cases), " FROM ", self.table, ";"])
+
+    def construct_load_data(self, excludes=None):
+        """ builds LOAD DATA LOCAL INFILE %s INTO TABLE table (index, cols...) -- the file
+            (csv, rows from append_params_frame) is passed as parameter
+        """
+        if not self.columns:
+            raise ValueError("construct_load_data does not accept NULL init_objections")
+
+        index_name = self.index_name if isinstance(self.index_name, list) else [self.index_name]
+        names = index_name + self.calc_column_names(excludes)
+
+        self.q_str = "".join(["LOAD DATA LOCAL INFILE %s INTO TABLE ", self.table,
+                              " FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"'",
+                              " LINES TERMINATED BY '\\n' (", ", ".join(names), ")"])
 
     def append_values_naive(self, series):
         ''' naive append of values '''
@@ -214,6 +314,70 @@ class sql_query_base():
 
         return base
 
+    def calc_value_names(self, df):
+        ''' DataFrame columns written (in order) -- self.columns values else all columns '''
+        if isinstance(self.columns, (dict, co.OrderedDict)):
+            return list(self.columns.values())
+        return df.columns.to_list()
+
+    def compile_row_format(self, width):
+        ''' precompiles (once per width) row template ('%s', %s, ..., %s) '''
+        if self.row_format is None or self.row_format[0] != width:
+            self.row_format = (width, "".join(["('%s'", ", %s"*width, ")"]))
+        return self.row_format[1]
+
+    def encode_columns(self, df, null='NULL'):
+        ''' encodes dates & whole value columns (str, NaN => null), returns (dates, columns)
+            -- numeric columns are upcast to the common dtype of df (as iterrows rows),
+            other columns are encoded per value (non numeric values raise TypeError)
+        '''
+        common = None
+        if df.shape[1] > 0 and all([isinstance(itm, np.dtype) and
+                                    np.issubdtype(itm, np.number) for itm in df.dtypes]):
+            common = np.result_type(*df.dtypes)
+
+        cols = []
+        for key in self.calc_value_names(df):
+            arr = df[key].to_numpy()
+            if common is None:
+                cols.append([null if np.isnan(val) else str(val) for val in arr])
+            elif np.issubdtype(common, np.floating):
+                arr = arr.astype(common, copy=False)
+                cols.append(np.where(np.isnan(arr), null, arr.astype(str)).tolist())
+            else:
+                cols.append(arr.astype(common, copy=False).astype(str).tolist())
+
+        dates = convert_timestamps(df.index)
+        return dates, cols
+
+    def encode_values_frame(self, df, output="rows"):
+        ''' columnar value encoder -- output: rows (list of row strings), tuples (list of
+            encoded value tuples) or buffer (single joined VALUES string), identical to
+            append_values_dict / append_values_naive
+        '''
+        dates, cols = self.encode_columns(df)
+        if output == "tuples":
+            return list(zip(dates, *cols))
+
+        fmt = self.compile_row_format(len(cols))
+        rows = [fmt % row for row in zip(dates, *cols)]
+        return ", \n".join(rows) if output == "buffer" else rows
+
+    def append_params_frame(self, df):
+        ''' columnar construction of executemany parameters -- returns list of tuples
+            (date, val_1, ..., val_n) w/ NaN => None (ordered as encode_values_frame)
+        '''
+        cols = []
+        for key in self.calc_value_names(df):
+            arr = df[key].to_numpy()
+            vals = arr.astype(object)
+            if np.issubdtype(arr.dtype, np.floating):
+                vals[np.isnan(arr)] = None
+            cols.append(vals.tolist())
+
+        dates = convert_timestamps(df.index)
+        return list(zip(dates, *cols))
+
     def append_query_element(self, val, append=", "):
         """ append element to current q_str using user spec'd split """
         self.q_str = append.join([self.q_str, val])
@@ -324,6 +488,52 @@ def convert_timestamp(val, split="-"):
 
     return res
 
+@ft.lru_cache(maxsize=4096)
+def convert_date_str(val, split="-"):
+    """ Cached (LRU) conversion of %Y-%m-%d or %Y/%m/%d str into a date str"""
+    return convert_timestamp(val, split=split)
+
+def convert_timestamps(vals, split="-"):
+    """ Batch variant of convert_timestamp -- DatetimeIndex / datetime64 arrays are
+        formatted via datetime64[D], str arrays via convert_date_str, returns list of str
+    """
+    if isinstance(vals, pd.DatetimeIndex) or (
+            hasattr(vals, "dtype") and pd.api.types.is_datetime64_any_dtype(vals.dtype)):
+        idx = pd.DatetimeIndex(vals)
+        if idx.hasnans:
+            raise ValueError("Required Type TimeStamp (NaT)")
+        if idx.tz is not None:
+            idx = idx.tz_localize(None)
+        res = idx.to_numpy().astype("datetime64[D]").astype(str)
+        if split != "-":
+            res = np.char.replace(res, "-", split)
+        return res.tolist()
+
+    return [convert_date_str(val, split) if isinstance(val, str) else
+            convert_timestamp(val, split=split) for val in vals]
+
+def convert_date_columns(df, index_col=None):
+    """ Parses index_col & date like columns (dt.date / %Y-%m-%d text) of query result
+        into datetime64, index_col (if specified) is used as index & retained as column
+    """
+    for key in df.columns:
+        if pd.api.types.is_numeric_dtype(df[key]) or\
+                pd.api.types.is_datetime64_any_dtype(df[key]):
+            continue
+
+        first = df[key].first_valid_index()
+        val = df[key][first] if first is not None else None
+        if key == index_col or isinstance(val, dt.date) or\
+                (isinstance(val, str) and DATE_PATTERN.match(val)):
+            try:
+                df[key] = pd.to_datetime(df[key])
+            except (TypeError, ValueError):
+                continue
+
+    if index_col is not None:
+        df.index = df[index_col]
+    return df
+
 def calc_table_name(q_str, qtype):
     """ Calculates SQL table from query string """
     table = None
@@ -0,0 +1,58 @@
+""" pytest configuration -- src & bin modules importable by tests, scratch sqlite fixtures """
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("src", "bin"):
+    if os.path.join(ROOT, folder) not in sys.path:
+        sys.path.insert(0, os.path.join(ROOT, folder))
+
+RATES_TABLE = "CREATE TABLE %s (index_date TEXT PRIMARY KEY, A REAL, B REAL)"
+
+
+class scratch_sqlite():
+    ''' scratch sqlite file -- statements / reads run on short lived engines (disposed) '''
+    def __init__(self, db_file):
+        self.sa = pytest.importorskip("sqlalchemy")
+        self.db_file = db_file
+
+    def execute(self, *statements):
+        ''' executes statements in single transaction '''
+        engine = self.sa.create_engine("sqlite:///" + self.db_file)
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(self.sa.text(statement))
+        engine.dispose()
+
+    def rows(self, query):
+        ''' returns rows of query as list of tuples '''
+        engine = self.sa.create_engine("sqlite:///" + self.db_file)
+        with engine.connect() as conn:
+            rows = conn.execute(self.sa.text(query)).fetchall()
+        engine.dispose()
+        return [tuple(row) for row in rows]
+
+    def count(self, table):
+        ''' number of rows in table '''
+        return self.rows("SELECT COUNT(*) FROM " + table)[0][0]
+
+    def options(self, table="rates", **kwargs):
+        ''' interface options of sqlite backend table (index_date) '''
+        options = {"backend": "sqlite", "db_file": self.db_file, "table": table,
+                   "index_name": "index_date"}
+        options.update(kwargs)
+        return options
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    ''' empty scratch sqlite database '''
+    return scratch_sqlite(str(tmp_path / "rates.db"))
+
+
+@pytest.fixture
+def rates_db(sqlite_db):
+    ''' scratch sqlite database w/ empty wide rates (index_date, A, B) table '''
+    sqlite_db.execute(RATES_TABLE % ("rates"))
+    return sqlite_db
@@ -0,0 +1,70 @@
+""" fred_cache expiry of open-ended ranges & index sharing between instances """
+import json
+import os
+import time
+import pandas as pd
+import fred_cache as fc
+
+
+def build_series(name, periods=5):
+    index = pd.date_range("2020-01-01", periods=periods, freq="D")
+    return pd.Series([1.0] * periods, index=index, name=name)
+
+
+def test_open_ended_range_expires(tmp_path):
+    cache = fc.fred_cache({"directory": str(tmp_path), "format": "pickle", "open_ttl": 60})
+    cache.put("DGS10", build_series("DGS10"), "2020-01-01", None)
+    cache.put("DGS10", build_series("DGS10"), "2020-01-01", "2020-01-05")
+    assert cache.get("DGS10", "2020-01-01", None) is not None
+
+    # age entries beyond open_ttl -- closed range (ttl None) never expires
+    index_file = os.path.join(str(tmp_path), fc.fred_cache.INDEX_FILE)
+    with open(index_file, "r") as fp:
+        index = json.load(fp)
+    for entry in index.values():
+        entry["created"] = time.time() - 120
+    with open(index_file, "w") as fp:
+        json.dump(index, fp)
+
+    assert cache.get("DGS10", "2020-01-01", None) is None
+    assert cache.get("DGS10", "2020-01-01", "2020-01-05") is not None
+
+
+def test_open_ended_default_ttl(tmp_path):
+    cache = fc.fred_cache({"directory": str(tmp_path), "format": "pickle"})
+    assert cache.open_ttl > 0
+
+    cache = fc.fred_cache({"directory": str(tmp_path), "format": "pickle", "ttl": 10})
+    assert cache.open_ttl == 10
+
+
+def test_instances_merge_index(tmp_path):
+    options = {"directory": str(tmp_path), "format": "pickle"}
+    first = fc.fred_cache(options)
+    second = fc.fred_cache(options)
+
+    first.put("DGS1", build_series("DGS1"), "2020-01-01", "2020-01-05")
+    second.put("DGS10", build_series("DGS10"), "2020-01-01", "2020-01-05")
+    first.save_index()
+
+    with open(os.path.join(str(tmp_path), fc.fred_cache.INDEX_FILE), "r") as fp:
+        index = json.load(fp)
+    assert len(index) == 2
+    assert first.get("DGS10", "2020-01-01", "2020-01-05") is not None
+
+
+def test_eviction_counts_all_instances(tmp_path):
+    options = {"directory": str(tmp_path), "format": "pickle"}
+    first = fc.fred_cache(options)
+    first.put("DGS1", build_series("DGS1", 1000), "2020-01-01", None)
+    size = os.path.getsize(first.index[first.calc_key("DGS1", "2020-01-01")]["file"])
+
+    # bound of ~1.5 entries -- second instance must evict first's entry
+    options["max_mb"] = 1.5 * size / (1024 * 1024)
+    second = fc.fred_cache(options)
+    second.put("DGS10", build_series("DGS10", 1000), "2020-01-01", None)
+
+    files = [itm for itm in os.listdir(str(tmp_path)) if itm.endswith(".pickle")]
+    assert len(files) == 1
+    assert second.evictions == 1
+    assert first.get("DGS1", "2020-01-01", None) is None
@@ -0,0 +1,115 @@
+""" Offline tests of fred_interface concurrent extraction (fake Fred client) """
+import random
+import threading
+import time
+import pandas as pd
+import pytest
+import fred_interface as fredi
+
+
+class fake_fred():
+    ''' fredapi.Fred stand-in -- random latency, scripted failures '''
+    def __init__(self, fail=None, transient=None):
+        self.fail = fail if fail else []
+        self.transient = dict(transient) if transient else {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_series(self, item, observation_start=None, observation_end=None):
+        with self.lock:
+            self.calls.append(item)
+            transient = self.transient.get(item, 0)
+            if transient > 0:
+                self.transient[item] = transient - 1
+
+        time.sleep(random.uniform(0.0, 0.02))
+        if item in self.fail:
+            raise ValueError("Bad Request.  The series does not exist.")
+        if transient > 0:
+            raise OSError("Connection reset")
+
+        index = pd.date_range(observation_start, periods=5, freq="D")
+        return pd.Series([float(len(item))] * 5, index=index, name=item)
+
+
+def build_options(items, **kwargs):
+    ''' minimal extraction options '''
+    options = {"api_key": "test", "items": {itm: '' for itm in items},
+               "start_date": "2020-01-01", "concurrency": 4, "rate_limit": 100000,
+               "backoff": 0.0}
+    options.update(kwargs)
+    return options
+
+
+def test_extract_keeps_items_order():
+    items = ["DGS%d" % (itm) for itm in range(1, 13)]
+    fred = fake_fred()
+    res = fredi.fred_interface(build_options(items), fred=fred)
+
+    assert res.df.columns.to_list() == items
+    assert sorted(fred.calls) == sorted(items)
+    assert (res.df["DGS10"] == 5.0).all()
+
+
+def test_extract_failed_series_dropped():
+    items = ["DGS1", "BAD", "DGS10"]
+    fred = fake_fred(fail=["BAD"])
+    res = fredi.fred_interface(build_options(items, retries=3), fred=fred)
+
+    assert res.df.columns.to_list() == ["DGS1", "DGS10"]
+    assert fred.calls.count("BAD") == 1      # Bad Request is not retried
+
+
+def test_extract_transient_failure_retried():
+    fred = fake_fred(transient={"DGS2": 2})
+    res = fredi.fred_interface(build_options(["DGS2", "DGS5"], retries=3), fred=fred)
+
+    assert res.df.columns.to_list() == ["DGS2", "DGS5"]
+    assert fred.calls.count("DGS2") == 3
+
+
+def test_extract_retries_exhausted():
+    fred = fake_fred(transient={"DGS2": 5})
+    res = fredi.fred_interface(build_options(["DGS2", "DGS5"], retries=1), fred=fred)
+
+    assert res.df.columns.to_list() == ["DGS5"]
+    assert fred.calls.count("DGS2") == 2
+
+
+def test_rate_limiter_spacing():
+    limiter = fredi.rate_limiter(rate=10, period=0.5)     # one slot per 0.05s
+    stamps = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(3):
+            limiter.acquire()
+            with lock:
+                stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # slots are 0.05s apart & sleeps never end early -- i-th request no earlier than
+    # i slots after the first (individual gaps vary w/ scheduling jitter)
+    stamps.sort()
+    assert len(stamps) == 12
+    assert all([stamp - stamps[0] >= pos * 0.05 - 0.01 for pos, stamp in enumerate(stamps)])
+
+
+def test_extract_respects_rate_limit():
+    items = ["S%d" % (itm) for itm in range(6)]
+    start = time.monotonic()
+    fredi.fred_interface(build_options(items, concurrency=6, rate_limit=600), fred=fake_fred())
+    # 600 / minute => 0.1s between requests
+    assert time.monotonic() - start >= 5 * 0.1 - 0.02
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_extract_concurrency_levels(concurrency):
+    items = ["A", "BB", "CCC"]
+    res = fredi.fred_interface(build_options(items, concurrency=concurrency), fred=fake_fred())
+    assert res.df.columns.to_list() == items
@@ -0,0 +1,58 @@
+""" calc_table_watermark / execute_info_query results cached until writes (sqlite backend) """
+import pandas as pd
+import pytest
+import base_interest_rates_interface as biri
+
+INFO_QUERY = "SELECT MAX(index_date) AS index_date FROM rates"
+
+
+@pytest.fixture
+def db_interface(rates_db, request):
+    options = rates_db.options(items={"A": "", "B": ""}, insert_mode="executemany")
+    if request.param:
+        options["current_view"] = {"query": INFO_QUERY}
+    db_interface = biri.base_rates_db_interface(options, False)
+
+    # counts statements reaching the backend
+    db_interface.hits = 0
+    for name in ["calc_watermark", "query"]:
+        method = getattr(db_interface.mysql_conn, name)
+
+        def counted(*args, method=method, **kwargs):
+            db_interface.hits += 1
+            return method(*args, **kwargs)
+        setattr(db_interface.mysql_conn, name, counted)
+    return db_interface
+
+
+def write_rows(db_interface, start, periods):
+    df = pd.DataFrame({"A": 1.0, "B": 2.0}, index=pd.date_range(start, periods=periods))
+    assert db_interface.construct_db_insert(df) == 0
+
+
+@pytest.mark.parametrize("db_interface", [False], indirect=True)
+def test_table_watermark_cached(db_interface):
+    write_rows(db_interface, "2020-01-01", 2)
+    assert db_interface.calc_table_watermark() == pd.Timestamp("2020-01-02").date()
+    assert db_interface.calc_table_watermark() == pd.Timestamp("2020-01-02").date()
+    assert db_interface.hits == 1
+    assert db_interface.db_stats == {"round_trips": 1, "saved": 1}
+
+    write_rows(db_interface, "2020-01-03", 2)
+    assert db_interface.calc_table_watermark() == pd.Timestamp("2020-01-04").date()
+    assert db_interface.hits == 2
+    assert db_interface.db_stats == {"round_trips": 2, "saved": 1}
+
+
+@pytest.mark.parametrize("db_interface", [True], indirect=True)
+def test_info_query_cached(db_interface):
+    write_rows(db_interface, "2020-01-01", 2)
+    assert db_interface.calc_max_date() == "2020-01-02"
+    assert db_interface.calc_max_date() == "2020-01-02"
+    assert db_interface.hits == 1
+    assert db_interface.db_stats == {"round_trips": 1, "saved": 1}
+
+    write_rows(db_interface, "2020-01-03", 1)
+    assert db_interface.calc_max_date() == "2020-01-03"
+    assert db_interface.hits == 2
+    assert db_interface.db_stats == {"round_trips": 2, "saved": 1}
@@ -0,0 +1,115 @@
+""" load_exchange_rates window splitting & merging against stub HTTP server """
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+import pandas as pd
+import pytest
+import requests
+import load_exchange_rates as lex
+
+
+class stub_handler(http.server.BaseHTTPRequestHandler):
+    ''' history?start_at=&end_at= -- business day rates (value = day of month) also
+        reporting the business day preceding start_at (as the API does on weekends)
+    '''
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        self.server.requests.append((query["start_at"][0], query["end_at"][0]))
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if query["start_at"][0] in self.server.fail:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        start = pd.Timestamp(query["start_at"][0])
+        dates = pd.bdate_range(start - pd.offsets.BDay(1), query["end_at"][0])
+        symbols = query["symbols"][0].split(",") if "symbols" in query.keys() else ["USD"]
+        body = json.dumps({
+            "base": "EUR", "start_at": query["start_at"][0], "end_at": query["end_at"][0],
+            "rates": {itm.strftime("%Y-%m-%d"): {sym: float(itm.day) for sym in symbols}
+                      for itm in dates}}).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class stub_server_class(http.server.ThreadingHTTPServer):
+    ''' ignores clients disconnecting (request timeouts) '''
+    def handle_error(self, request, client_address):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = stub_server_class(("127.0.0.1", 0), stub_handler)
+    server.requests = []
+    server.fail = []
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def build_options(server, start, end, window_days=None, **kwargs):
+    url_control = {"url": "http://127.0.0.1:%d" % (server.server_address[1]),
+                   "start_date": start, "end_date": end, "symbols": ["USD", "GBP"]}
+    if window_days:
+        url_control["window_days"] = window_days
+    options = {"url_control": url_control, "concurrency": 3}
+    options.update(kwargs)
+    return options
+
+
+def test_calc_windows():
+    options = {"url_control": {"start_date": "2020-01-01", "end_date": "2020-01-25",
+                               "window_days": 10}}
+    assert lex.calc_windows(options) == [("2020-01-01", "2020-01-10"),
+                                         ("2020-01-11", "2020-01-20"),
+                                         ("2020-01-21", "2020-01-25")]
+
+    options["url_control"].pop("window_days")
+    assert lex.calc_windows(options) == [None]
+
+
+def test_windows_requested(stub_server):
+    lex.load_exchange_rates(build_options(stub_server, "2020-01-01", "2020-03-31", 30))
+    assert sorted(stub_server.requests) == [
+        ("2020-01-01", "2020-01-30"), ("2020-01-31", "2020-02-29"),
+        ("2020-03-01", "2020-03-30"), ("2020-03-31", "2020-03-31")]
+
+
+def test_windows_merged(stub_server):
+    whole = lex.load_exchange_rates(build_options(stub_server, "2020-01-06", "2020-03-31"))
+    split = lex.load_exchange_rates(build_options(stub_server, "2020-01-06", "2020-03-31",
+                                                  7))
+
+    # dates reported at window edges (preceding business day) are merged once
+    assert split["rates"] == whole["rates"]
+    assert len(split["rates"]) == len(set(split["rates"].keys()))
+    assert split["start_at"] == "2020-01-06" and split["end_at"] == "2020-03-31"
+    assert split["rates"]["2020-01-13"] == {"USD": 13.0, "GBP": 13.0}
+
+
+def test_failed_window_raises(stub_server):
+    stub_server.fail = ["2020-01-11"]
+    with pytest.raises(ValueError):
+        lex.load_exchange_rates(build_options(stub_server, "2020-01-01", "2020-01-31", 10))
+
+
+def test_request_timeout(stub_server):
+    stub_server.delay = 1.0
+    with pytest.raises(requests.exceptions.Timeout):
+        lex.load_exchange_rates(build_options(stub_server, "2020-01-01", "2020-01-05",
+                                              timeout=0.1))
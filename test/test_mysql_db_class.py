@@ -0,0 +1,105 @@
+""" mysql_db_class load_data_local, insert_batches & key check (fake connection) """
+import os
+import pytest
+
+dbsql = pytest.importorskip("mysql_db_class")
+
+
+class fake_cursor():
+    ''' LOAD DATA stand-in -- loads all but skipped csv rows, reports warnings '''
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+        self.result = []
+
+    def execute(self, query, params=None):
+        if query == "SHOW WARNINGS":
+            self.result = list(self.conn.warnings)
+            return
+        if query.startswith("SHOW INDEX"):
+            self.result = list(self.conn.keys)
+            return
+        with open(params[0], "r") as fp:
+            lines = fp.read().splitlines()
+        self.conn.files.append(params[0])
+        self.rowcount = len(lines) - self.conn.skipped
+
+    def executemany(self, query, batch):
+        self.conn.batches.append(list(batch))
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class fake_connection():
+    def __init__(self, skipped=0, warnings=None):
+        self.skipped = skipped
+        self.warnings = warnings if warnings else []
+        self.files = []
+        self.batches = []
+        self.keys = []
+        self.committed = 0
+        self.rolled_back = 0
+
+    def cursor(self, **kwargs):
+        return fake_cursor(self)
+
+    def commit(self):
+        self.committed += 1
+
+    def rollback(self):
+        self.rolled_back += 1
+
+    def close(self):
+        pass
+
+
+def build_db_class(conn):
+    db_class = dbsql.mysql_db_class.__new__(dbsql.mysql_db_class)
+    db_class.connection = conn
+    db_class.cursor = None
+    db_class.dict_cursor = None
+    return db_class
+
+
+ROWS = [("2020-01-01", 1.0, None), ("2020-01-02", 2.0, 2.5)]
+
+
+def test_load_data_all_rows(tmp_path):
+    conn = fake_connection()
+    assert build_db_class(conn).load_data_local("LOAD %s", ROWS, tmp_dir=str(tmp_path)) == 0
+    assert conn.committed == 1 and conn.rolled_back == 0
+    assert not os.path.exists(conn.files[0])
+
+
+@pytest.mark.parametrize("skipped, warnings", [
+    (1, [("Warning", 1062, "Duplicate entry '2020-01-01' for key 'PRIMARY'")]),
+    (0, [("Warning", 1265, "Data truncated for column 'A' at row 2")])])
+def test_load_data_skipped_rows_fail(tmp_path, skipped, warnings):
+    conn = fake_connection(skipped=skipped, warnings=warnings)
+    assert build_db_class(conn).load_data_local("LOAD %s", ROWS, tmp_dir=str(tmp_path)) == 1
+    assert conn.committed == 0 and conn.rolled_back == 1
+
+
+def test_insert_batches_commit_per_batch():
+    conn = fake_connection()
+    rows = [("2020-01-0%d" % (day), float(day)) for day in range(1, 6)]
+    assert build_db_class(conn).insert_batches("INSERT %s", iter(rows), batch_size=2,
+                                               commit_per_batch=True) == 0
+    assert conn.batches == [rows[:2], rows[2:4], rows[4:]]
+    assert conn.committed == 4
+
+
+@pytest.mark.parametrize("keys, unique", [
+    ([("PRIMARY", 1, "index_date")], True),
+    ([("PRIMARY", 2, "series_id"), ("PRIMARY", 1, "index_date")], False),
+    ([("PRIMARY", 1, "id"), ("date_key", 1, "index_date")], True),
+    ([], False)])
+def test_calc_has_unique_key(keys, unique):
+    conn = fake_connection()
+    conn.keys = [{"Key_name": name, "Seq_in_index": seq, "Column_name": column}
+                 for name, seq, column in keys]
+    assert build_db_class(conn).calc_has_unique_key("rates", "index_date") is unique
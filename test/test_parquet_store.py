@@ -0,0 +1,39 @@
+""" Parquet store export / import round trip (sqlite backend) """
+import numpy as np
+import pandas as pd
+import pytest
+import base_interest_rates_interface as biri
+from conftest import RATES_TABLE
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def options(rates_db):
+    rates_db.execute(RATES_TABLE % ("rates_copy"))
+    return rates_db.options(items={"A": "", "B": ""}, insert_mode="executemany", batch_size=2)
+
+
+def test_import_counts_rows_inserted(rates_db, options, tmp_path):
+    db_interface = biri.base_rates_db_interface(options, False)
+    df = pd.DataFrame({"A": np.arange(6, dtype=float), "B": [1.0, np.nan] * 3},
+                      index=pd.to_datetime(["2019-12-30", "2019-12-31", "2020-01-02",
+                                            "2020-06-30", "2021-01-04", "2021-01-05"]))
+    assert db_interface.construct_db_insert(df, filtered=False) == 0
+
+    store = str(tmp_path / "store")
+    assert db_interface.export_parquet(store) == {2019: 2, 2020: 2, 2021: 2}
+
+    # 2020 already loaded -- failed year (duplicate keys) is not counted
+    options["table"] = "rates_copy"
+    db_copy = biri.base_rates_db_interface(options, False)
+    assert db_copy.import_parquet(store, years=[2020]) == 2
+    assert db_copy.import_parquet(store) == 4
+    assert rates_db.count("rates_copy") == 6
+
+
+def test_import_rejects_vertical(options, tmp_path):
+    options["columns"] = {"index_date": "", "series_id": "", "value": "", "source": ""}
+    db_interface = biri.base_rates_db_interface(options, False)
+    with pytest.raises(ValueError):
+        db_interface.import_parquet(str(tmp_path / "store"))
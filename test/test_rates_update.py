@@ -0,0 +1,119 @@
+""" construct_db_insert_update update modes fill NULL cells only, diff mode writes
+    changed cells only (sqlite backend)
+"""
+import pandas as pd
+import pytest
+import interest_rates_interface_extended as rates_dbi
+
+CURRENT_VIEW = ("SELECT r.*, (SELECT MAX(index_date) FROM rates) AS max_date FROM rates r "
+                "ORDER BY index_date")
+
+
+@pytest.fixture
+def options(sqlite_db):
+    sqlite_db.execute("CREATE TABLE rates (index_date TEXT PRIMARY KEY, one REAL, ten REAL)",
+                      "INSERT INTO rates VALUES ('2020-01-01', 1.0, NULL), "
+                      "('2020-01-02', NULL, 2.0), ('2020-01-03', 3.0, 3.0)")
+    return sqlite_db.options(items={"DGS1": "one", "DGS10": "ten"}, update={"items": {}},
+                             insert_mode="executemany", start_date="2019-12-31",
+                             current_view={"query": CURRENT_VIEW, "max_date": "max_date"})
+
+
+def test_query_frame_parses_dates(options):
+    db_interface = rates_dbi.rates_db_interface_extended(options, False)
+    current_df = db_interface.mysql_conn.query_frame(CURRENT_VIEW, index_col="index_date")
+
+    assert isinstance(current_df.index, pd.DatetimeIndex)
+    assert pd.api.types.is_datetime64_any_dtype(current_df["max_date"])
+    assert isinstance(db_interface.mysql_conn.query("SELECT * FROM rates")[0], dict)
+
+
+@pytest.mark.parametrize("update_mode", ["cell", "upsert", "staging"])
+def test_update_fills_null_cells(sqlite_db, options, update_mode):
+    options["update_mode"] = update_mode
+    db_interface = rates_dbi.rates_db_interface_extended(options, False)
+
+    df = pd.DataFrame({"DGS1": [1.1, 2.2, 3.3, 4.4], "DGS10": [1.5, 2.5, 3.5, 4.5]},
+                      index=pd.date_range("2020-01-01", periods=4))
+    df_new = db_interface.construct_db_insert_update(df)
+
+    assert df_new.index.to_list() == [pd.Timestamp("2020-01-04")]
+    assert sqlite_db.rows("SELECT * FROM rates ORDER BY index_date") == [
+        ("2020-01-01", 1.0, 1.5), ("2020-01-02", 2.2, 2.0),
+        ("2020-01-03", 3.0, 3.0), ("2020-01-04", 4.4, 4.5)]
+
+
+def build_revisions():
+    return pd.DataFrame({"DGS1": [1.001, 2.2, 3.5, 4.4],
+                         "DGS10": [float("nan"), 2.0, 3.0, 4.5]},
+                        index=pd.date_range("2020-01-01", periods=4))
+
+
+def test_diff_writes_changes_only(sqlite_db, options):
+    options.update({"update_mode": "diff", "diff_tolerance": 0.01})
+    db_interface = rates_dbi.rates_db_interface_extended(options, False)
+
+    df_new = db_interface.construct_db_insert_update(build_revisions())
+
+    # 2020-01-01 within tolerance (no-op), 2020-01-02 NULL filled, 2020-01-03 revised
+    assert df_new.index.to_list() == [pd.Timestamp("2020-01-04")]
+    assert sqlite_db.rows("SELECT * FROM rates ORDER BY index_date") == [
+        ("2020-01-01", 1.0, None), ("2020-01-02", 2.2, 2.0),
+        ("2020-01-03", 3.5, 3.0), ("2020-01-04", 4.4, 4.5)]
+    assert db_interface.diff_stats == {"inserts": 1, "updates": 2, "cells": 2, "noops": 1}
+
+
+def test_diff_rerun_writes_nothing(sqlite_db, options, monkeypatch):
+    options.update({"update_mode": "diff", "diff_tolerance": 0.01})
+    db_interface = rates_dbi.rates_db_interface_extended(options, False)
+    db_interface.construct_db_insert_update(build_revisions())
+    rows = sqlite_db.rows("SELECT * FROM rates ORDER BY index_date")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("unchanged rerun must not write")
+
+    monkeypatch.setattr(db_interface.mysql_conn, "upsert", fail)
+    monkeypatch.setattr(db_interface, "construct_db_insert", fail)
+    df_new = db_interface.construct_db_insert_update(build_revisions())
+
+    assert df_new.empty
+    assert sqlite_db.rows("SELECT * FROM rates ORDER BY index_date") == rows
+    assert db_interface.diff_stats == {"inserts": 1, "updates": 2, "cells": 2, "noops": 5}
+
+
+def test_dict_update_batches(sqlite_db, options):
+    options.update({"batch_size": 2, "update": {
+        "query": "UPDATE rates SET one = %(DGS1)s, ten = %(DGS10)s WHERE index_date = %(index)s"}})
+    db_interface = rates_dbi.rates_db_interface_extended(options, False)
+
+    batches = []
+    execute_batch = db_interface.mysql_conn.execute_batch
+
+    def counted(conn, query, batch):
+        batches.append(len(batch))
+        return execute_batch(conn, query, batch)
+    db_interface.mysql_conn.execute_batch = counted
+
+    assert db_interface.db_dict_update({
+        pd.Timestamp("2020-01-01").to_pydatetime(): {"DGS1": 1.5, "DGS10": 1.6},
+        "2020-01-02": {"DGS1": 2.5, "DGS10": 2.6},
+        "2020-01-03": {"DGS1": 3.5, "DGS10": None}}) == 0
+
+    assert batches == [2, 1]
+    assert sqlite_db.rows("SELECT * FROM rates ORDER BY index_date") == [
+        ("2020-01-01", 1.5, 1.6), ("2020-01-02", 2.5, 2.6), ("2020-01-03", 3.5, None)]
+
+
+def test_upsert_requires_unique_key(sqlite_db, options):
+    sqlite_db.execute("CREATE TABLE rates_nokey (index_date TEXT, one REAL, ten REAL)")
+    options["update_mode"] = "staging"
+    assert rates_dbi.rates_db_interface_extended(
+        options, False).options["update_mode"] == "upsert"
+
+    options["table"] = "rates_nokey"
+    assert rates_dbi.rates_db_interface_extended(
+        options, False).options["update_mode"] == "cell"
+
+    options["update_mode"] = "diff"
+    with pytest.raises(ValueError, match="unique key"):
+        rates_dbi.rates_db_interface_extended(options, False)
@@ -0,0 +1,51 @@
+""" Watermark file only advances over rows actually written (sqlite backend) """
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import base_interest_rates_interface as biri
+import fred_interface as fredi
+
+
+@pytest.fixture
+def options(rates_db, tmp_path):
+    return rates_db.options(items={"A": "", "B": ""}, insert_mode="executemany",
+                            watermark_file=str(tmp_path / "marks.json"))
+
+
+def read_marks(options):
+    with open(options["watermark_file"], "r") as fp:
+        return json.load(fp)
+
+
+def test_excluded_rows_do_not_advance(options):
+    db_interface = biri.base_rates_db_interface(options, False)
+    df = pd.DataFrame({"A": [1.0, 2.0, np.nan], "B": [1.5, 2.5, 3.5]},
+                      index=pd.date_range("2020-01-01", periods=3))
+    fredi.write_frame(db_interface, df)
+
+    # last row (50% NaN > exclude_perc) is not written
+    assert read_marks(options) == {"A": "2020-01-02", "B": "2020-01-02"}
+
+
+def test_failed_write_does_not_advance(options):
+    options["table"] = "missing_table"
+    db_interface = biri.base_rates_db_interface(options, False)
+    df = pd.DataFrame({"A": [1.0], "B": [2.0]}, index=pd.date_range("2020-01-01", periods=1))
+    fredi.write_frame(db_interface, df)
+
+    assert not db_interface.written
+    with pytest.raises(FileNotFoundError):
+        read_marks(options)
+
+
+def test_watermarks_merge_with_file(options):
+    with open(options["watermark_file"], "w") as fp:
+        json.dump({"A": "2021-01-01", "C": "2019-05-01"}, fp)
+
+    db_interface = biri.base_rates_db_interface(options, False)
+    df = pd.DataFrame({"A": [1.0, 2.0], "B": [1.5, 2.5]},
+                      index=pd.date_range("2020-01-01", periods=2))
+    fredi.write_frame(db_interface, df)
+
+    assert read_marks(options) == {"A": "2021-01-01", "B": "2020-01-02", "C": "2019-05-01"}
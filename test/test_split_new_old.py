@@ -0,0 +1,51 @@
+""" split_new_old (searchsorted) matches the previous year/month/day mask split """
+import numpy as np
+import pandas as pd
+import pytest
+import interest_rates_interface_extended as rates_dbi
+
+
+def split_masks(df, max_date, start_date):
+    ''' previous split of construct_db_insert_update (day resolution masks) '''
+    new_ind = np.logical_and(df.index.year == max_date.year, df.index.month > max_date.month)
+    new_ind = np.logical_or(df.index.year > max_date.year, new_ind)
+    new_ind2 = np.logical_and(df.index.year == max_date.year,
+                              df.index.month == max_date.month)
+    new_ind2 = np.logical_and(new_ind2, df.index.day > max_date.day)
+    new_ind = np.logical_or(new_ind, new_ind2)
+
+    old_ind2 = np.logical_and(df.index.year == max_date.year, df.index.month < max_date.month)
+    old_ind2 = np.logical_or(old_ind2, df.index.year < max_date.year)
+    old_ind3 = np.logical_and(df.index.year == max_date.year,
+                              df.index.month == max_date.month)
+    old_ind3 = np.logical_and(old_ind3, df.index.day <= max_date.day)
+    old_ind2 = np.logical_or(old_ind2, old_ind3)
+    old_ind = np.logical_and(df.index > start_date, old_ind2)
+    return df[new_ind], df[old_ind]
+
+
+def build_frame(index, shuffle):
+    df = pd.DataFrame({"A": np.arange(len(index), dtype=float)}, index=index)
+    if shuffle:
+        df = df.sample(frac=1.0, random_state=7)
+    return df
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+@pytest.mark.parametrize("index", [
+    pd.date_range("2019-11-20", "2020-03-10", freq="D"),
+    pd.date_range("2019-12-30", "2020-01-12", freq="5h")], ids=["daily", "intraday"])
+def test_split_matches_masks(index, shuffle):
+    db_interface = rates_dbi.rates_db_interface_extended.__new__(
+        rates_dbi.rates_db_interface_extended)
+    db_interface.options = {"start_date": "2019-12-31"}
+    db_interface.mysql_conn, db_interface.dbg = None, None
+    df = build_frame(index, shuffle)
+
+    for max_date in [pd.Timestamp("2020-01-10 12:00"), pd.Timestamp("2020-02-29"),
+                     pd.Timestamp("2019-12-31")]:
+        df_new, df_old = db_interface.split_new_old(df, max_date)
+        mask_new, mask_old = split_masks(df, max_date, "2019-12-31")
+
+        pd.testing.assert_frame_equal(df_new, mask_new)
+        pd.testing.assert_frame_equal(df_old, mask_old)
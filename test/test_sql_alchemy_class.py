@@ -0,0 +1,165 @@
+""" sqlalchemy_db_class (sqlite) bulk insert, upsert & procedure emulation """
+import numpy as np
+import pandas as pd
+import pytest
+import base_interest_rates_interface as biri
+import rates_db_backend as rdb
+
+sa = pytest.importorskip("sqlalchemy")
+sac = pytest.importorskip("sql_alchemy_class")
+
+
+@pytest.fixture
+def db_class(tmp_path):
+    db_class = sac.sqlalchemy_db_class(path=str(tmp_path / "rates.db"))
+    with db_class.engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE rates (index_date TEXT PRIMARY KEY, A REAL, B REAL)"))
+    yield db_class
+    db_class.close()
+
+
+def read_pragmas(db_class):
+    with db_class.engine.connect() as conn:
+        return [conn.exec_driver_sql("PRAGMA " + name).scalar()
+                for name in ["journal_mode", "synchronous", "cache_size"]]
+
+
+def build_frame(rows):
+    return pd.DataFrame({"A": np.arange(rows, dtype=float), "B": np.nan},
+                        index=pd.date_range("2020-01-01", periods=rows, name="index_date"))
+
+
+def test_bulk_insert_restores_pragmas(db_class):
+    prior = read_pragmas(db_class)
+    assert db_class.insert(build_frame(100), {"table": "rates", "bulk": True,
+                                              "chunk_size": 30}) == 0
+
+    assert read_pragmas(db_class) == prior
+    with db_class.engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT COUNT(*), SUM(A) FROM rates")).fetchone() ==\
+            (100, 4950.0)
+
+
+def test_failed_bulk_insert_restores_pragmas(db_class):
+    prior = read_pragmas(db_class)
+    df = build_frame(10)
+    assert db_class.insert(df, {"table": "rates", "bulk": True}) == 0
+    assert db_class.insert(df, {"table": "rates", "bulk": True}) == 1     # duplicate keys
+
+    assert read_pragmas(db_class) == prior
+    with db_class.engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT COUNT(*) FROM rates")).scalar() == 10
+
+
+def build_options(db_class, **kwargs):
+    options = {"backend": "sqlite", "db_file": db_class.engine.url.database, "table": "rates",
+               "index_name": "index_date", "items": {"A": "", "B": ""},
+               "current_view": {"procedure": "rates_max"}}
+    options.update(kwargs)
+    return options
+
+
+def test_unregistered_procedure_raises(db_class):
+    with pytest.raises(ValueError, match="rates_max"):
+        db_class.execute_stored_procedure_result("rates_max", [])
+
+    db_interface = biri.base_rates_db_interface(build_options(db_class), False)
+    with pytest.raises(ValueError, match="not registered"):
+        db_interface.calc_max_date()
+
+
+def test_procedures_from_options(db_class):
+    db_class.insert(build_frame(3), {"table": "rates", "bulk": True})
+    options = build_options(db_class, procedures={
+        "rates_max": "SELECT MAX(index_date) AS index_date FROM rates WHERE A >= %s"})
+    options["current_view"]["vars"] = [1.0]
+
+    db_interface = biri.base_rates_db_interface(options, False)
+    assert db_interface.calc_max_date() == "2020-01-03"
+    assert db_interface.mysql_conn.execute_stored_procedure_result("rates_max", [5.0]) ==\
+        [{"index_date": None}]
+
+
+def test_upsert_fills_null_cells(db_class):
+    db_class.insert(build_frame(2), {"table": "rates", "bulk": True})
+    vals = [("2020-01-01", 9.0, 1.5), ("2020-01-03", 2.0, None)]
+    assert db_class.upsert("rates", "index_date", ["A", "B"], vals) == 0
+
+    with db_class.engine.connect() as conn:
+        rows = conn.execute(sa.text("SELECT * FROM rates ORDER BY index_date")).fetchall()
+    assert [tuple(row) for row in rows] == [
+        ("2020-01-01", 0.0, 1.5), ("2020-01-02", 1.0, None), ("2020-01-03", 2.0, None)]
+
+
+def test_backends_implement_protocol(db_class):
+    assert isinstance(db_class, rdb.rates_db_backend)
+
+    dbsql = pytest.importorskip("mysql_db_class")
+    names = [itm for itm in dir(rdb.rates_db_backend) if not itm.startswith("_")]
+    assert "upsert" in names and "query_frame" in names
+    assert all([callable(getattr(dbsql.mysql_db_class, itm, None)) for itm in names])
+
+
+def test_bulk_insert_unnamed_index(db_class):
+    df = build_frame(5).rename_axis(None)
+    assert db_class.insert(df, {"table": "rates", "bulk": True}) == 1
+    assert db_class.insert(df, {"table": "rates", "bulk": True, "index_name": "index_date"}) == 0
+
+    with db_class.engine.connect() as conn:
+        assert conn.execute(sa.text(
+            "SELECT COUNT(*) FROM rates WHERE index_date IS NOT NULL")).scalar() == 5
+
+
+def test_bulk_insert_unmapped_index(db_class):
+    with db_class.engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE rates_nokey (index_date TEXT, A REAL)"))
+    df = build_frame(3).rename_axis("date")
+    assert db_class.insert(df, {"table": "rates_nokey", "bulk": True}) == 1
+    assert db_class.insert(df.reset_index(drop=True), {"table": "rates_nokey",
+                                                       "bulk": True}) == 0
+
+
+def test_calc_watermark(db_class):
+    assert db_class.calc_watermark("rates", "index_date") is None
+    db_class.insert(build_frame(3), {"table": "rates", "bulk": True})
+    assert db_class.calc_watermark("rates", "index_date") == pd.Timestamp("2020-01-03").date()
+
+
+@pytest.fixture
+def reflected():
+    ''' names of tables reflected (one entry per column reflected) '''
+    names = []
+
+    def count(inspector, table, column_info):
+        names.append(table.name)
+    sa.event.listen(sa.Table, "column_reflect", count)
+    yield names
+    sa.event.remove(sa.Table, "column_reflect", count)
+
+
+def test_schema_reflected_once(db_class, reflected):
+    with db_class.engine.begin() as conn:
+        conn.execute(sa.text("CREATE TABLE other (index_date TEXT PRIMARY KEY, C REAL)"))
+    table = db_class.get_table("rates")
+    assert db_class.get_table("rates") is table
+
+    second = sac.sqlalchemy_db_class(path=db_class.engine.url.database)
+    assert second.get_table("rates") is table
+    second.get_table("other")
+    second.close()
+
+    assert reflected == ["rates"] * 3 + ["other"] * 2
+
+
+def test_refresh_schema(db_class, reflected):
+    assert list(db_class.get_table("rates").columns.keys()) == ["index_date", "A", "B"]
+    with db_class.engine.begin() as conn:
+        conn.execute(sa.text("ALTER TABLE rates ADD COLUMN C REAL"))
+    assert list(db_class.get_table("rates").columns.keys()) == ["index_date", "A", "B"]
+
+    db_class.refresh_schema("rates")
+    assert list(db_class.get_table("rates").columns.keys()) == ["index_date", "A", "B", "C"]
+    assert db_class.insert(build_frame(2).assign(C=5.0), {"table": "rates", "bulk": True}) == 0
+    with db_class.engine.connect() as conn:
+        assert conn.execute(sa.text("SELECT SUM(C) FROM rates")).scalar() == 10.0
+    assert len(reflected) == 7
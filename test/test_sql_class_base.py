@@ -0,0 +1,97 @@
+""" encode_values_frame matches legacy per-cell encoders (append_values_dict / naive) """
+import numpy as np
+import pandas as pd
+import pytest
+import sql_class_base as sbc
+
+
+def build_query(items, columns=None):
+    info = {"table": "rates", "index_name": "index_date", "items": items}
+    if columns is not None:
+        info["columns"] = columns
+    return sbc.sql_query_base(info, q_str="INSERT")
+
+
+def legacy_rows(insert_query, df):
+    ''' reference iterrows encoding (as legacy db_dataframe_insert) '''
+    if isinstance(insert_query.columns, (dict, sbc.co.OrderedDict)):
+        return [insert_query.append_values_dict(row) for row in df.iterrows()]
+    return [insert_query.append_values_naive(row) for row in df.iterrows()]
+
+
+def check_encoders(insert_query, df):
+    rows = legacy_rows(insert_query, df)
+    assert insert_query.encode_values_frame(df, output="rows") == rows
+    assert insert_query.encode_values_frame(df, output="buffer") == ", \n".join(rows)
+
+
+def test_nan_and_floats():
+    rng = np.random.default_rng(7)
+    vals = rng.standard_normal((50, 3)) * np.array([1e-7, 1.0, 1e17])
+    vals[rng.random((50, 3)) < 0.3] = np.nan
+    df = pd.DataFrame(vals, columns=["A", "B", "C"],
+                      index=pd.date_range("2020-01-01", periods=50))
+    check_encoders(build_query({"A": "", "B": "", "C": ""}), df)
+
+
+def test_mapped_columns_order():
+    df = pd.DataFrame({"DGS1": [1.5, np.nan], "DGS10": [np.nan, 2.25]},
+                      index=pd.date_range("2020-01-01", periods=2))
+    check_encoders(build_query({"DGS10": "ten", "DGS1": "one"}), df)
+
+
+def test_naive_single_item():
+    df = pd.DataFrame({"A": [1.0, np.nan, -0.0]},
+                      index=pd.date_range("2020-01-01", periods=3))
+    insert_query = build_query({"A": ""})
+    assert insert_query.columns is None
+    check_encoders(insert_query, df)
+
+
+def test_int_columns_upcast():
+    df = pd.DataFrame({"A": [1, 2], "B": [0.5, np.nan]},
+                      index=pd.date_range("2020-01-01", periods=2))
+    check_encoders(build_query({"A": "", "B": ""}), df)
+
+    df = pd.DataFrame({"A": [1, 2], "B": [3, 4]}, index=pd.date_range("2020-01-01", periods=2))
+    check_encoders(build_query({"A": "", "B": ""}), df)
+
+
+@pytest.mark.parametrize("index", [
+    pd.DatetimeIndex(["2020-01-01 13:45", "2021-12-31 00:00"]),
+    pd.date_range("2020-01-01 23:00", periods=2, tz="US/Eastern"),
+    pd.Index(["2020-01-02", "2020/01/03"]),
+])
+def test_dates(index):
+    df = pd.DataFrame({"A": [1.0, np.nan], "B": [np.nan, 2.0]}, index=index)
+    check_encoders(build_query({"A": "", "B": ""}), df)
+
+
+def test_object_numbers():
+    index = pd.date_range("2020-01-01", periods=2)
+    df = pd.DataFrame({"A": pd.Series([1.0, np.nan], dtype=object, index=index),
+                       "B": [1, 2]}, index=index)
+    assert df["A"].dtype == object
+    check_encoders(build_query({"A": "", "B": ""}), df)
+
+
+@pytest.mark.parametrize("vals", [["1.5", "2.5"], ["O'Brien", 'say "hi"'], [None, 1.0]])
+def test_strings_rejected(vals):
+    index = pd.date_range("2020-01-01", periods=2)
+    df = pd.DataFrame({"A": pd.Series(vals, dtype=object, index=index), "B": [1.0, 2.0]},
+                      index=index)
+    insert_query = build_query({"A": "", "B": ""})
+    with pytest.raises(TypeError):
+        legacy_rows(insert_query, df)
+    with pytest.raises(TypeError):
+        insert_query.encode_values_frame(df)
+
+
+@pytest.mark.parametrize("date", ["2020-01-0'1", "01/02/2020", "2020-01-01'); DROP"])
+def test_bad_dates_rejected(date):
+    df = pd.DataFrame({"A": [1.0], "B": [2.0]}, index=pd.Index([date]))
+    insert_query = build_query({"A": "", "B": ""})
+    with pytest.raises(ValueError):
+        legacy_rows(insert_query, df)
+    with pytest.raises(ValueError):
+        insert_query.encode_values_frame(df)
@@ -0,0 +1,34 @@
+""" Multi item vertical (date, id, value, source) table writes (sqlite backend) """
+import numpy as np
+import pandas as pd
+import pytest
+import base_interest_rates_interface as biri
+import fred_interface as fredi
+
+
+@pytest.fixture
+def options(sqlite_db):
+    sqlite_db.execute("CREATE TABLE series (index_date TEXT, series_id TEXT, value REAL, "
+                      "source TEXT, PRIMARY KEY (index_date, series_id))")
+    return sqlite_db.options(
+        "series", items={"DGS1": "", "DGS10": "", "DGS30": ""}, source="FRED",
+        columns={"index_date": "", "series_id": "", "value": "", "source": ""})
+
+
+def test_multi_item_vertical_insert(sqlite_db, options):
+    db_interface = biri.base_rates_db_interface(options, False)
+    assert db_interface.calc_is_vertical()
+    assert list(db_interface.insert_query.columns.keys()) == list(options["columns"].keys())
+
+    df = pd.DataFrame({"DGS1": [1.0, 1.1], "DGS10": [2.0, np.nan], "DGS30": [3.0, 3.1]},
+                      index=pd.date_range("2020-01-01", periods=2))
+    fredi.write_frame(db_interface, df)
+
+    assert sqlite_db.rows("SELECT index_date, series_id, value, source FROM series "
+                          "ORDER BY series_id, index_date") == [
+        ("2020-01-01", "DGS1", 1.0, "FRED"), ("2020-01-02", "DGS1", 1.1, "FRED"),
+        ("2020-01-01", "DGS10", 2.0, "FRED"),
+        ("2020-01-01", "DGS30", 3.0, "FRED"), ("2020-01-02", "DGS30", 3.1, "FRED")]
+
+    assert db_interface.calc_series_watermarks() == {
+        "DGS1": "2020-01-02", "DGS10": "2020-01-01", "DGS30": "2020-01-02"}